@@ -0,0 +1,35 @@
+"""Arquiva as transações antigas em partições mensais e compacta o banco.
+
+Uso:
+    python arquivar.py --antes-de 2025-01-01
+    python arquivar.py --antes-de 2025-01-01 --pasta /backup/arquivo --lote 50000
+
+As transações com criada_em anterior à data são movidas para
+<pasta>/transacoes-AAAA-MM.db, apagadas da tabela principal, e o banco passa
+por VACUUM/ANALYZE. Elas continuam disponíveis em GET /arquivo/transacoes.
+"""
+import argparse
+import os
+from datetime import date
+
+from database import engine
+from migracoes import aplicar_migracoes
+import particoes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--antes-de", required=True, type=date.fromisoformat, help="data de corte (AAAA-MM-DD), exclusiva")
+    parser.add_argument("--pasta", default=os.getenv("ARQUIVO_PASTA", "arquivo"), help="pasta das partições")
+    parser.add_argument("--lote", type=int, default=10000, help="linhas movidas por transação")
+    parser.add_argument("--sem-vacuum", action="store_true", help="não executa VACUUM no banco principal")
+    args = parser.parse_args()
+
+    aplicar_migracoes(engine)
+    movidas = particoes.arquivar(engine.url.database, args.pasta, args.antes_de, args.lote, vacuum=not args.sem_vacuum)
+
+    for mes, quantidade in movidas.items():
+        print(f"{mes}: {quantidade} transações arquivadas em {particoes.caminho_particao(args.pasta, mes)}")
+    print(f"Arquivamento concluído! ({sum(movidas.values())} transações)")
+
+if __name__ == "__main__":
+    main()
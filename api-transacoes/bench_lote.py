@@ -0,0 +1,50 @@
+"""Compara a vazão de POST /transacoes (uma linha por requisição) com POST /transacoes/lote.
+
+Uso:
+    python bench_lote.py --total 5000 --tamanho-lote 1000
+
+O teste roda em um banco SQLite temporário, sem tocar no transacoes.db.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--total", type=int, default=5000, help="quantidade de transações gravadas em cada cenário")
+    parser.add_argument("--tamanho-lote", type=int, default=1000, help="itens por chamada de /transacoes/lote")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix="bench_lote_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(pasta, 'bench.db')}"
+
+    # Importa a aplicação só depois de apontar DATABASE_URL para o banco temporário
+    from fastapi.testclient import TestClient
+    import main as app_main
+
+    # O "with" roda o lifespan da aplicação, que cria as tabelas no banco temporário
+    with TestClient(app_main.app) as cliente:
+        medir(cliente, args)
+
+def medir(cliente, args):
+    itens = [{"tipo": "deposito", "valor": float(i % 500 + 1), "usuario_id": i % 100 + 1} for i in range(args.total)]
+
+    inicio = time.perf_counter()
+    for item in itens:
+        resposta = cliente.post("/transacoes", json=item)
+        resposta.raise_for_status()
+    tempo_unitario = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for i in range(0, len(itens), args.tamanho_lote):
+        resposta = cliente.post("/transacoes/lote", json=itens[i:i + args.tamanho_lote])
+        resposta.raise_for_status()
+    tempo_lote = time.perf_counter() - inicio
+
+    print(f"POST /transacoes      : {args.total} linhas em {tempo_unitario:.2f}s ({args.total / tempo_unitario:,.0f} linhas/s)")
+    print(f"POST /transacoes/lote : {args.total} linhas em {tempo_lote:.2f}s ({args.total / tempo_lote:,.0f} linhas/s)")
+    print(f"Ganho: {tempo_unitario / tempo_lote:.1f}x")
+
+if __name__ == "__main__":
+    main()
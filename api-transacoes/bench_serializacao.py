@@ -0,0 +1,70 @@
+"""Mede o custo por linha de serializar transações antes e depois do caminho com orjson.
+
+Antes: entidades ORM (`db.query(Transacao)`) passadas pelo jsonable_encoder
+do FastAPI e pelo json da biblioteca padrão, como fazia a listagem antiga.
+Depois: tuplas de colunas convertidas pelo codificador pré-montado e
+serializadas com orjson, como fazem os endpoints atuais.
+
+Uso:
+    python bench_serializacao.py --linhas 50000
+
+O teste roda em um banco SQLite temporário, sem tocar no transacoes.db.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+def medir(funcao, repeticoes: int) -> float:
+    """Retorna o menor tempo de `repeticoes` execuções."""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=50000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix="bench_serializacao_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(pasta, 'bench.db')}"
+
+    from fastapi.encoders import jsonable_encoder
+    from sqlalchemy.orm import defer
+    import crud
+    from database import SessionLocal, engine
+    from migracoes import aplicar_migracoes
+    from models import Transacao
+    from serializacao import codificar_transacao, dumps
+
+    aplicar_migracoes(engine)
+    with SessionLocal() as db:
+        linhas = [{"tipo": "deposito", "valor": float(i % 500 + 1), "usuario_id": i % 100 + 1} for i in range(args.linhas)]
+        crud.inserir_transacoes(db, linhas)
+        db.commit()
+
+    def antes():
+        with SessionLocal() as db:
+            # criada_em fica de fora para comparar as mesmas quatro colunas
+            transacoes = db.query(Transacao).options(defer(Transacao.criada_em)).all()
+            json.dumps(jsonable_encoder({"mensagem": "Todas as transações", "transacoes": transacoes}))
+
+    def depois():
+        with SessionLocal() as db:
+            linhas = db.query(Transacao.id, Transacao.tipo, Transacao.valor, Transacao.usuario_id).all()
+            dumps({"mensagem": "Todas as transações", "transacoes": [codificar_transacao(linha) for linha in linhas]})
+
+    tempo_antes = medir(antes, args.repeticoes)
+    tempo_depois = medir(depois, args.repeticoes)
+
+    print(f"ORM + jsonable_encoder : {tempo_antes * 1e6 / args.linhas:.2f} µs/linha ({tempo_antes:.3f}s)")
+    print(f"Tuplas + orjson        : {tempo_depois * 1e6 / args.linhas:.2f} µs/linha ({tempo_depois:.3f}s)")
+    print(f"Ganho: {tempo_antes / tempo_depois:.1f}x")
+
+if __name__ == "__main__":
+    main()
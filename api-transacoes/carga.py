@@ -0,0 +1,217 @@
+"""Importação e exportação em massa de transações e saldos.
+
+Uso:
+    python carga.py importar transacoes transacoes.csv --tamanho-lote 20000
+    python carga.py importar saldos saldos.ndjson
+    python carga.py exportar transacoes transacoes.ndjson.gz
+    python carga.py exportar saldos saldos.csv
+
+Formatos aceitos pela extensão: .csv, .ndjson ou .jsonl, com ou sem .gz.
+Transações: colunas tipo, valor, usuario_id e, opcionalmente, criada_em (ISO 8601).
+Saldos: colunas usuario_id e saldo (contas existentes têm o saldo substituído).
+
+Os arquivos são lidos e escritos em streaming, então a memória não depende
+do tamanho do arquivo. A importação grava o checkpoint (tabela
+cargas_checkpoint) no mesmo commit de cada lote; se for interrompida, a
+próxima execução continua de onde parou. Use --do-inicio para ignorar o
+checkpoint.
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database import SessionLocal, engine
+from migracoes import aplicar_migracoes
+from models import CheckpointCarga, Conta, Transacao
+import crud
+
+CAMPOS = {
+    "transacoes": ("id", "tipo", "valor", "usuario_id", "criada_em"),
+    "saldos": ("usuario_id", "saldo"),
+}
+
+# ------------------- ARQUIVOS -------------------
+def _formato(caminho: str) -> str:
+    nome = caminho[:-3] if caminho.endswith(".gz") else caminho
+    if nome.endswith(".csv"):
+        return "csv"
+    if nome.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    raise SystemExit(f"Formato não reconhecido: {caminho} (use .csv, .ndjson ou .jsonl)")
+
+def _abrir(caminho: str, modo: str):
+    if caminho.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(caminho, modo + "b"), encoding="utf-8", newline="")
+    return open(caminho, modo, encoding="utf-8", newline="")
+
+def ler_registros(caminho: str) -> Iterator[Dict]:
+    """Lê o arquivo registro a registro, como dicts de strings (CSV) ou valores JSON (NDJSON)."""
+    formato = _formato(caminho)
+    with _abrir(caminho, "r") as arquivo:
+        if formato == "csv":
+            yield from csv.DictReader(arquivo)
+        else:
+            for linha in arquivo:
+                if linha.strip():
+                    yield json.loads(linha)
+
+# ------------------- CONVERSÃO -------------------
+def converter_transacao(registro: Dict) -> Dict:
+    tipo = registro["tipo"]
+    valor = float(registro["valor"])
+    if tipo not in ("deposito", "retirada", "transferencia_enviada", "transferencia_recebida"):
+        raise ValueError(f"tipo inválido: {tipo}")
+    if not math.isfinite(valor) or valor <= 0 or valor > crud.VALOR_MAXIMO:
+        raise ValueError(f"valor inválido: {registro['valor']}")
+    criada_em = registro.get("criada_em")
+    return {
+        "tipo": tipo,
+        "valor": valor,
+        "usuario_id": int(registro["usuario_id"]),
+        "criada_em": datetime.fromisoformat(criada_em) if criada_em else datetime.utcnow(),
+    }
+
+def converter_saldo(registro: Dict) -> Dict:
+    saldo = float(registro["saldo"])
+    if not math.isfinite(saldo):
+        raise ValueError(f"saldo inválido: {registro['saldo']}")
+    return {"id": int(registro["usuario_id"]), "saldo": saldo}
+
+def gravar_transacoes(db, lote: List[Dict]) -> None:
+    # executemany: um único comando preparado para o lote inteiro
+    db.execute(insert(Transacao), lote)
+    crud.atualizar_resumo(db, lote)
+
+def gravar_saldos(db, lote: List[Dict]) -> None:
+    comando = sqlite_insert(Conta)
+    db.execute(comando.on_conflict_do_update(index_elements=[Conta.id], set_={"saldo": comando.excluded.saldo}), lote)
+
+CONVERSORES = {"transacoes": converter_transacao, "saldos": converter_saldo}
+GRAVADORES = {"transacoes": gravar_transacoes, "saldos": gravar_saldos}
+
+# ------------------- CHECKPOINT -------------------
+def _ler_checkpoint(db, arquivo: str, tabela: str) -> int:
+    registros = db.scalar(select(CheckpointCarga.registros).where(
+        CheckpointCarga.arquivo == arquivo, CheckpointCarga.tabela == tabela))
+    return registros or 0
+
+def _gravar_checkpoint(db, arquivo: str, tabela: str, registros: int) -> None:
+    comando = sqlite_insert(CheckpointCarga).values(arquivo=arquivo, tabela=tabela, registros=registros)
+    db.execute(comando.on_conflict_do_update(index_elements=[CheckpointCarga.arquivo, CheckpointCarga.tabela],
+                                             set_={"registros": comando.excluded.registros}))
+
+def _apagar_checkpoint(arquivo: str, tabela: str) -> None:
+    with SessionLocal() as db:
+        db.execute(delete(CheckpointCarga).where(CheckpointCarga.arquivo == arquivo, CheckpointCarga.tabela == tabela))
+        db.commit()
+
+# ------------------- COMANDOS -------------------
+def importar(tabela: str, caminho: str, tamanho_lote: int, do_inicio: bool) -> None:
+    # O checkpoint fica no banco, identificado pelo caminho absoluto do arquivo e pela tabela
+    arquivo_checkpoint = os.path.abspath(caminho)
+    if do_inicio:
+        _apagar_checkpoint(arquivo_checkpoint, tabela)
+    with SessionLocal() as db:
+        ja_importados = _ler_checkpoint(db, arquivo_checkpoint, tabela)
+    if ja_importados:
+        print(f"Retomando após {ja_importados} registros (checkpoint no banco)", file=sys.stderr)
+
+    converter, gravar = CONVERSORES[tabela], GRAVADORES[tabela]
+    inicio = time.perf_counter()
+    lidos = gravados = invalidos = 0
+    lote: List[Dict] = []
+
+    def confirmar():
+        nonlocal gravados
+        db = SessionLocal()
+        try:
+            gravar(db, lote)
+            # Lote e checkpoint no mesmo commit: uma interrupção nunca deixa
+            # um lote gravado sem o checkpoint correspondente, nem o contrário
+            _gravar_checkpoint(db, arquivo_checkpoint, tabela, lidos)
+            db.commit()
+        finally:
+            db.close()
+        gravados += len(lote)
+        lote.clear()
+        decorrido = time.perf_counter() - inicio
+        print(f"  {lidos:>12,} registros lidos, {gravados:>12,} gravados ({gravados / decorrido:,.0f}/s)", file=sys.stderr)
+
+    for numero, registro in enumerate(ler_registros(caminho), start=1):
+        if numero <= ja_importados:
+            continue
+        lidos = numero
+        try:
+            lote.append(converter(registro))
+        except (KeyError, TypeError, ValueError) as e:
+            invalidos += 1
+            if invalidos <= 10:
+                print(f"Registro {numero} ignorado: {e}", file=sys.stderr)
+        if len(lote) >= tamanho_lote:
+            confirmar()
+    if lote:
+        confirmar()
+
+    _apagar_checkpoint(arquivo_checkpoint, tabela)
+    decorrido = time.perf_counter() - inicio
+    print(f"Importação concluída! {gravados} registros gravados, {invalidos} ignorados em {decorrido:.1f}s.")
+
+def exportar(tabela: str, caminho: str, tamanho_lote: int) -> None:
+    campos = CAMPOS[tabela]
+    if tabela == "transacoes":
+        colunas = (Transacao.id, Transacao.tipo, Transacao.valor, Transacao.usuario_id, Transacao.criada_em)
+        ordem = Transacao.id
+    else:
+        colunas = (Conta.id, Conta.saldo)
+        ordem = Conta.id
+
+    formato = _formato(caminho)
+    inicio = time.perf_counter()
+    total = 0
+    db = SessionLocal()
+    try:
+        with _abrir(caminho, "w") as arquivo:
+            escritor = csv.writer(arquivo) if formato == "csv" else None
+            if escritor:
+                escritor.writerow(campos)
+            for linha in db.query(*colunas).order_by(ordem).yield_per(tamanho_lote):
+                valores = [valor.isoformat() if isinstance(valor, datetime) else valor for valor in linha]
+                if escritor:
+                    escritor.writerow(valores)
+                else:
+                    arquivo.write(json.dumps(dict(zip(campos, valores)), ensure_ascii=False) + "\n")
+                total += 1
+                if total % tamanho_lote == 0:
+                    print(f"  {total:>12,} registros exportados ({total / (time.perf_counter() - inicio):,.0f}/s)", file=sys.stderr)
+    finally:
+        db.close()
+    print(f"Exportação concluída! {total} registros em {caminho} ({time.perf_counter() - inicio:.1f}s).")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("comando", choices=["importar", "exportar"])
+    parser.add_argument("tabela", choices=["transacoes", "saldos"])
+    parser.add_argument("arquivo")
+    parser.add_argument("--tamanho-lote", type=int, default=10000, help="registros por commit (importação) ou por leitura (exportação)")
+    parser.add_argument("--do-inicio", action="store_true", help="ignora o checkpoint de uma importação anterior")
+    args = parser.parse_args()
+
+    aplicar_migracoes(engine)
+    if args.comando == "importar":
+        importar(args.tabela, args.arquivo, args.tamanho_lote, args.do_inicio)
+    else:
+        exportar(args.tabela, args.arquivo, args.tamanho_lote)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class Configuracoes:
+    """Opções da aplicação usadas pelo `create_app`.
+
+    `migrar` aplica as migrações e cria as contas iniciais quando o servidor
+    sobe; com False, o esquema deve ser preparado antes (`python migrar.py`).
+    """
+
+    migrar: bool = True
+    configurar_logs: bool = True
+    log_arquivo: Optional[str] = None
+    group_commit: bool = False
+    group_commit_janela_ms: float = 5.0
+    group_commit_max_itens: int = 500
+    pasta_arquivo: str = "arquivo"
+
+    @classmethod
+    def do_ambiente(cls) -> "Configuracoes":
+        """Lê as opções das variáveis de ambiente."""
+        return cls(
+            migrar=os.getenv("MIGRAR_NO_INICIO", "1") == "1",
+            log_arquivo=os.getenv("LOG_ARQUIVO"),
+            group_commit=os.getenv("GROUP_COMMIT") == "1",
+            group_commit_janela_ms=float(os.getenv("GROUP_COMMIT_JANELA_MS", "5")),
+            group_commit_max_itens=int(os.getenv("GROUP_COMMIT_MAX_ITENS", "500")),
+            pasta_arquivo=os.getenv("ARQUIVO_PASTA", "arquivo"),
+        )
@@ -0,0 +1,156 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from models import Conta, ResumoTransacao, Transacao
+
+# Saldos iniciais das contas de demonstração
+CONTAS_INICIAIS = {
+    1: 1000.50,
+    2: 5000.00
+}
+
+# Maior valor aceito em uma transação. Valores não finitos (NaN, infinito)
+# e valores enormes, cujas somas no saldo ou no resumo estourariam para
+# infinito, são recusados na entrada.
+VALOR_MAXIMO = 1e12
+
+# As alterações de saldo são feitas com um único UPDATE condicional, sem
+# ler o saldo antes. Assim duas requisições (ou dois workers) nunca
+# sobrescrevem o resultado uma da outra.
+
+def creditar(db: Session, conta_id: int, valor: float) -> bool:
+    """Soma o valor ao saldo da conta. Retorna False se a conta não existir."""
+    resultado = db.execute(
+        update(Conta)
+        .where(Conta.id == conta_id)
+        .values(saldo=Conta.saldo + valor)
+        .execution_options(synchronize_session=False)
+    )
+    return resultado.rowcount == 1
+
+def debitar(db: Session, conta_id: int, valor: float) -> bool:
+    """Subtrai o valor do saldo se houver saldo suficiente. Retorna False caso contrário."""
+    resultado = db.execute(
+        update(Conta)
+        .where(Conta.id == conta_id, Conta.saldo >= valor)
+        .values(saldo=Conta.saldo - valor)
+        .execution_options(synchronize_session=False)
+    )
+    return resultado.rowcount == 1
+
+def conta_existe(db: Session, conta_id: int) -> bool:
+    return db.query(Conta.id).filter(Conta.id == conta_id).first() is not None
+
+def registrar_transacao(db: Session, tipo: str, valor: float, usuario_id: int) -> None:
+    """Adiciona a linha do extrato na transação corrente (o commit fica com quem chamou)."""
+    linha = {"tipo": tipo, "valor": valor, "usuario_id": usuario_id, "criada_em": datetime.utcnow()}
+    db.execute(insert(Transacao).values(**linha))
+    atualizar_resumo(db, [linha])
+
+# ------------------- RESUMO POR USUÁRIO -------------------
+def atualizar_resumo(db: Session, linhas: Iterable[Dict]) -> None:
+    """Soma as transações gravadas aos totais diários de resumo_transacoes.
+
+    As linhas são agrupadas antes, então um lote gera um UPSERT por
+    (usuário, tipo, dia) e não um por transação.
+    """
+    acumulado = defaultdict(lambda: [0, 0.0])
+    for linha in linhas:
+        criada_em = linha.get("criada_em")
+        chave = (linha["usuario_id"], linha["tipo"], criada_em.date().isoformat() if criada_em else "")
+        acumulado[chave][0] += 1
+        acumulado[chave][1] += linha["valor"]
+    somar_resumo(db, ((*chave, quantidade, total) for chave, (quantidade, total) in acumulado.items()))
+
+def somar_resumo(db: Session, agregados: Iterable[Tuple[int, str, str, int, float]]) -> None:
+    """Soma totais já agrupados (usuario_id, tipo, dia, quantidade, total) ao resumo."""
+    valores = [
+        {"usuario_id": usuario_id, "tipo": tipo, "dia": dia or "", "quantidade": quantidade, "total": total}
+        for usuario_id, tipo, dia, quantidade, total in agregados
+    ]
+    for inicio in range(0, len(valores), LINHAS_POR_UPSERT):
+        comando = sqlite_insert(ResumoTransacao).values(valores[inicio:inicio + LINHAS_POR_UPSERT])
+        comando = comando.on_conflict_do_update(
+            index_elements=[ResumoTransacao.usuario_id, ResumoTransacao.tipo, ResumoTransacao.dia],
+            set_={
+                "quantidade": ResumoTransacao.quantidade + comando.excluded.quantidade,
+                "total": ResumoTransacao.total + comando.excluded.total,
+            },
+        )
+        db.execute(comando)
+
+def reconstruir_resumo(db: Session, agregados_arquivo: Iterable[Tuple[int, str, str, int, float]] = ()) -> int:
+    """Recalcula todo o resumo a partir da tabela de transações. Retorna a quantidade de linhas geradas.
+
+    `agregados_arquivo` traz os totais das transações já arquivadas (veja
+    `particoes.agregados`), que não estão mais na tabela principal.
+    """
+    db.execute(delete(ResumoTransacao))
+    dia = func.coalesce(func.date(Transacao.criada_em), "")
+    consulta = (
+        select(Transacao.usuario_id, Transacao.tipo, dia, func.count(), func.sum(Transacao.valor))
+        .where(Transacao.usuario_id.isnot(None), Transacao.tipo.isnot(None))
+        .group_by(Transacao.usuario_id, Transacao.tipo, dia)
+    )
+    db.execute(
+        insert(ResumoTransacao).from_select(
+            ["usuario_id", "tipo", "dia", "quantidade", "total"], consulta
+        )
+    )
+    somar_resumo(db, agregados_arquivo)
+    return db.query(func.count()).select_from(ResumoTransacao).scalar()
+
+def resumo_usuario(db: Session, usuario_id: int, agrupamento: str = "mes") -> Dict:
+    """Monta os totais por tipo e por período lendo só as linhas de resumo do usuário."""
+    periodo = ResumoTransacao.dia if agrupamento == "dia" else func.substr(ResumoTransacao.dia, 1, 7)
+    linhas = db.execute(
+        select(periodo, ResumoTransacao.tipo, func.sum(ResumoTransacao.quantidade), func.sum(ResumoTransacao.total))
+        .where(ResumoTransacao.usuario_id == usuario_id)
+        .group_by(periodo, ResumoTransacao.tipo)
+        .order_by(periodo, ResumoTransacao.tipo)
+    ).all()
+
+    por_tipo: Dict[str, Dict] = {}
+    periodos = []
+    for inicio, tipo, quantidade, total in linhas:
+        totais = por_tipo.setdefault(tipo, {"quantidade": 0, "total": 0.0})
+        totais["quantidade"] += quantidade
+        totais["total"] += total
+        # Transações antigas, sem data, entram só nos totais
+        if inicio:
+            periodos.append({"periodo": inicio, "tipo": tipo, "quantidade": quantidade, "total": total})
+    return {"por_tipo": por_tipo, "periodos": periodos}
+
+# O SQLite aceita no máximo 999 parâmetros por comando nas versões mais
+# antigas; com 4 colunas por linha, 240 linhas por INSERT cabem no limite.
+LINHAS_POR_INSERT = 240
+LINHAS_POR_UPSERT = 190
+
+def inserir_transacoes(db: Session, linhas: List[Dict]) -> List[int]:
+    """Insere várias transações com INSERT de múltiplas linhas e retorna os ids na ordem recebida.
+
+    Não faz commit: todas as linhas entram na transação corrente.
+    """
+    agora = datetime.utcnow()
+    for linha in linhas:
+        linha.setdefault("criada_em", agora)
+
+    ids: List[int] = []
+    for inicio in range(0, len(linhas), LINHAS_POR_INSERT):
+        bloco = linhas[inicio:inicio + LINHAS_POR_INSERT]
+        resultado = db.execute(insert(Transacao).values(bloco).returning(Transacao.id))
+        # Dentro de um mesmo INSERT o SQLite atribui os ids em ordem
+        # crescente, mas não garante a ordem das linhas do RETURNING.
+        ids.extend(sorted(id_ for (id_,) in resultado))
+    atualizar_resumo(db, linhas)
+    return ids
+
+def criar_contas_iniciais(db: Session) -> None:
+    """Cadastra as contas de demonstração que ainda não existem no banco."""
+    for conta_id, saldo in CONTAS_INICIAIS.items():
+        if db.get(Conta, conta_id) is None:
+            db.add(Conta(id=conta_id, saldo=saldo))
+    db.commit()
@@ -1,15 +1,29 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 # Configuração do banco de dados SQLite
-DATABASE_URL = "sqlite:///./transacoes.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./transacoes.db")
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 
+# Ajustes do SQLite aplicados em cada nova conexão:
+# - WAL permite que leitores consultem o banco enquanto um escritor grava
+# - synchronous=NORMAL é seguro com WAL e evita um fsync por commit
+# - busy_timeout faz o escritor aguardar o lock em vez de falhar na hora
+@event.listens_for(engine, "connect")
+def configurar_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-16000")
+    cursor.close()
+
 # Criar a base para os modelos
 Base = declarative_base()
 
 # Criar a sessão do banco de dados
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
@@ -0,0 +1,185 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Optional
+
+import crud
+
+logger = logging.getLogger("api_transacoes.group_commit")
+
+# Marca enviada pela fila para encerrar a thread escritora
+_PARAR = object()
+
+# Tempo máximo que uma requisição espera pelo commit do seu lote
+ESPERA_MAXIMA_SEGUNDOS = 30.0
+
+
+class EscritorEncerrado(RuntimeError):
+    """O escritor não está em execução (ainda não iniciado ou em encerramento)."""
+
+
+class EscritorAgrupado:
+    """Agrupa inserções concorrentes de transações em um único commit.
+
+    Cada requisição coloca sua linha na fila e aguarda um Future. Uma única
+    thread escritora junta o que chegar durante `janela_ms` (ou até
+    `max_itens` linhas), grava tudo com um INSERT de múltiplas linhas e um
+    só commit, e então entrega o id de cada linha ao Future correspondente.
+    """
+
+    def __init__(self, fabrica_sessao, janela_ms: float = 5.0, max_itens: int = 500):
+        self.fabrica_sessao = fabrica_sessao
+        self.janela = janela_ms / 1000.0
+        self.max_itens = max_itens
+        self._fila: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        # Protege `_ativo` junto com a fila: depois que `parar` coloca o
+        # _PARAR, nenhum item novo entra atrás dele
+        self._lock_envio = threading.Lock()
+        self._ativo = False
+
+        self._lock_metricas = threading.Lock()
+        self._lotes = 0
+        self._itens = 0
+        self._maior_lote = 0
+        self._espera_total = 0.0
+        self._espera_maxima = 0.0
+
+    def iniciar(self) -> None:
+        with self._lock_envio:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._executar, name="escritor-agrupado", daemon=True)
+                self._thread.start()
+                self._ativo = True
+
+    def parar(self, timeout: Optional[float] = None) -> None:
+        """Grava o que ainda estiver na fila e encerra a thread escritora.
+
+        A partir daqui `enviar` lança `EscritorEncerrado`. Se a thread não
+        terminar dentro do `timeout`, ela continua gravando os lotes em
+        andamento; caso contrário, o que sobrar na fila recebe a exceção.
+        """
+        with self._lock_envio:
+            if self._thread is None:
+                return
+            self._ativo = False
+            self._fila.put(_PARAR)
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self._falhar_pendentes()
+        self._thread = None
+
+    def _falhar_pendentes(self) -> None:
+        while True:
+            try:
+                item = self._fila.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _PARAR:
+                item[1].set_exception(EscritorEncerrado("Escritor agrupado encerrado antes de gravar a transação"))
+
+    def enviar(self, linha: Dict) -> Future:
+        """Enfileira uma transação; o Future recebe o id gravado."""
+        futuro: Future = Future()
+        with self._lock_envio:
+            if not self._ativo:
+                raise EscritorEncerrado("Escritor agrupado não está em execução")
+            self._fila.put((linha, futuro, time.perf_counter()))
+        return futuro
+
+    def inserir(self, linha: Dict, timeout: Optional[float] = ESPERA_MAXIMA_SEGUNDOS) -> int:
+        """Enfileira uma transação e bloqueia até o commit do lote.
+
+        Lança `EscritorEncerrado` se o escritor estiver parado e
+        `concurrent.futures.TimeoutError` se o lote não for gravado dentro do `timeout`.
+        """
+        return self.enviar(linha).result(timeout)
+
+    def metricas(self) -> Dict:
+        with self._lock_metricas:
+            return {
+                "lotes": self._lotes,
+                "itens": self._itens,
+                "tamanho_medio_lote": self._itens / self._lotes if self._lotes else 0.0,
+                "maior_lote": self._maior_lote,
+                "espera_media_ms": self._espera_total / self._itens * 1000 if self._itens else 0.0,
+                "espera_maxima_ms": self._espera_maxima * 1000,
+                "pendentes": self._fila.qsize(),
+            }
+
+    def _executar(self) -> None:
+        encerrar = False
+        while not encerrar:
+            primeiro = self._fila.get()
+            if primeiro is _PARAR:
+                break
+
+            lote = [primeiro]
+            limite = time.monotonic() + self.janela
+            while len(lote) < self.max_itens:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    item = self._fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if item is _PARAR:
+                    encerrar = True
+                    break
+                lote.append(item)
+
+            self._gravar(lote)
+
+    def _gravar(self, lote) -> None:
+        db = self.fabrica_sessao()
+        try:
+            ids = crud.inserir_transacoes(db, [linha for linha, _, _ in lote])
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error("Erro ao gravar lote de %d transações, gravando uma a uma: %s", len(lote), e)
+            self._gravar_individualmente(lote)
+            return
+        finally:
+            db.close()
+
+        self._registrar_lote(lote)
+        for (_, futuro, _), id_ in zip(lote, ids):
+            futuro.set_result(id_)
+
+    def _gravar_individualmente(self, lote) -> None:
+        """Depois de uma falha no lote, grava cada item no seu próprio commit.
+
+        Assim uma linha ruim só falha o Future de quem a enviou; as demais
+        requisições do lote são gravadas normalmente.
+        """
+        gravados = []
+        for item in lote:
+            linha, futuro, _ = item
+            db = self.fabrica_sessao()
+            try:
+                id_ = crud.inserir_transacoes(db, [linha])[0]
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                futuro.set_exception(e)
+                continue
+            finally:
+                db.close()
+            gravados.append(item)
+            futuro.set_result(id_)
+        if gravados:
+            self._registrar_lote(gravados)
+
+    def _registrar_lote(self, lote) -> None:
+        agora = time.perf_counter()
+        esperas = [agora - enfileirado_em for _, _, enfileirado_em in lote]
+        with self._lock_metricas:
+            self._lotes += 1
+            self._itens += len(lote)
+            self._maior_lote = max(self._maior_lote, len(lote))
+            self._espera_total += sum(esperas)
+            self._espera_maxima = max(self._espera_maxima, max(esperas))
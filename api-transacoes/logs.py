@@ -0,0 +1,125 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from typing import Optional
+
+# Atributos que todo LogRecord já tem; o que sobrar veio de `extra=`
+_ATRIBUTOS_PADRAO = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "taskName"}
+
+
+class FormatadorJson(logging.Formatter):
+    """Formata cada registro como uma linha JSON, incluindo os campos passados em `extra`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            "data": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensagem": record.getMessage(),
+        }
+        for chave, valor in record.__dict__.items():
+            if chave not in _ATRIBUTOS_PADRAO:
+                dados[chave] = valor
+        if record.exc_info:
+            dados["excecao"] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class HandlerFilaLimitada(logging.handlers.QueueHandler):
+    """QueueHandler que nunca bloqueia a thread da requisição.
+
+    A formatação fica para a thread do QueueListener. Se a fila estiver
+    cheia (disco lento, por exemplo), o registro é descartado e contado em
+    `descartados` em vez de segurar a requisição.
+    """
+
+    def __init__(self, fila: queue.Queue):
+        super().__init__(fila)
+        self.descartados = 0
+        self._lock_descartados = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # O QueueHandler padrão formata a mensagem aqui; como o listener roda
+        # no mesmo processo, o registro pode seguir como está.
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock_descartados:
+                self.descartados += 1
+
+
+class ListenerFila(logging.handlers.QueueListener):
+    """QueueListener cujo encerramento não falha com a fila cheia.
+
+    O `stop` padrão coloca a marca de parada com `put_nowait`, que lança
+    `queue.Full` se a fila estiver cheia, e os registros pendentes nunca
+    são gravados. Aqui a marca espera na fila (enquanto a thread continua
+    esvaziando) por até `espera_parada` segundos. Se o destino estiver
+    travado e a marca não couber nesse tempo, o encerramento desiste sem
+    bloquear o processo.
+    """
+
+    def __init__(self, fila: queue.Queue, *handlers: logging.Handler, respect_handler_level: bool = False,
+                 espera_parada: float = 5.0):
+        super().__init__(fila, *handlers, respect_handler_level=respect_handler_level)
+        self.espera_parada = espera_parada
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        try:
+            self.queue.put(self._sentinel, timeout=self.espera_parada)
+        except queue.Full:
+            print("Logs pendentes descartados: a fila não esvaziou no encerramento", file=sys.stderr)
+        else:
+            self._thread.join(self.espera_parada)
+        self._thread = None
+
+
+_listener: Optional[ListenerFila] = None
+handler_fila: Optional[HandlerFilaLimitada] = None
+
+
+def configurar_logs(nivel: int = logging.INFO, arquivo: Optional[str] = None, tamanho_fila: int = 10000) -> HandlerFilaLimitada:
+    """Direciona os logs para uma fila limitada consumida por uma thread própria.
+
+    Sem `arquivo`, os registros vão para o stderr. Chamadas repetidas
+    reaproveitam a configuração existente.
+    """
+    global _listener, handler_fila
+    if handler_fila is not None:
+        return handler_fila
+
+    destino = logging.FileHandler(arquivo, encoding="utf-8") if arquivo else logging.StreamHandler(sys.stderr)
+    destino.setFormatter(FormatadorJson())
+
+    fila: queue.Queue = queue.Queue(maxsize=tamanho_fila)
+    handler_fila = HandlerFilaLimitada(fila)
+    _listener = ListenerFila(fila, destino, respect_handler_level=True)
+    _listener.start()
+    # O lifespan da aplicação chama `parar_logs`; o atexit cobre scripts que não têm lifespan
+    atexit.register(parar_logs)
+
+    raiz = logging.getLogger()
+    raiz.setLevel(nivel)
+    raiz.addHandler(handler_fila)
+    return handler_fila
+
+
+def parar_logs() -> None:
+    """Grava os registros que ainda estão na fila e desfaz a configuração de `configurar_logs`."""
+    global _listener, handler_fila
+    if handler_fila is None:
+        return
+    atexit.unregister(parar_logs)
+    logging.getLogger().removeHandler(handler_fila)
+    _listener.stop()
+    _listener.handlers[0].close()
+    _listener = handler_fila = None
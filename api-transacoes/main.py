@@ -1,38 +1,67 @@
-from fastapi import FastAPI, Depends, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, FastAPI, Body, Depends, HTTPException, Request, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from pydantic import BaseModel, validator
-from models import Transacao
-from database import SessionLocal, engine, Base
-from typing import Dict
+from pydantic import BaseModel, ValidationError, validator
+from models import Conta, Transacao
+from database import SessionLocal, engine
+from migracoes import aplicar_migracoes
+from configuracoes import Configuracoes
+from concurrent.futures import TimeoutError as EsperaEsgotada
+from contextlib import asynccontextmanager
+from datetime import date
+from functools import partial
+from typing import Any, List, Literal, Optional
+from group_commit import EscritorAgrupado, EscritorEncerrado
+from serializacao import RespostaOrjson, codificador_linhas, codificar_transacao, ndjson_transacao
+import crud
 import logging
+import logs
+import math
+import metricas
+import particoes
+import time
 
-# Cria as tabelas no banco de dados
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI()
-
-# Configuração de logs
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+# Os endpoints ficam no router; a aplicação é montada pelo create_app (no fim
+# do arquivo), que não toca no banco: migrações, logs e group commit só são
+# iniciados quando o servidor sobe.
+router = APIRouter()
+logger = logging.getLogger("api_transacoes")
 
 # ------------------- MIDDLEWARE GLOBAL PARA ERROS -------------------
-@app.middleware("http")
 async def middleware_tratamento_erros(request: Request, call_next):
+    inicio = time.perf_counter()
     try:
         response = await call_next(request)
-        return response
     except HTTPException as http_error:
-        return JSONResponse(
+        response = JSONResponse(
             status_code=http_error.status_code,
             content={"erro": http_error.detail}
         )
     except Exception as e:
-        logging.error(f"Erro inesperado: {str(e)}")
-        return JSONResponse(
+        logger.error("Erro inesperado: %s", e)
+        response = JSONResponse(
             status_code=500,
             content={"erro": "Erro interno no servidor. Por favor, tente novamente mais tarde."}
         )
+    metricas.registrar_requisicao(request.method, metricas.rota_da_requisicao(request.scope),
+                                  response.status_code, time.perf_counter() - inicio)
+    return response
+
+# ------------------- MÉTRICAS -------------------
+@metricas.registro.coletor
+def metricas_logs():
+    if logs.handler_fila is None:
+        return []
+    return [
+        "# HELP logs_descartados_total Registros de log descartados porque a fila estava cheia.",
+        "# TYPE logs_descartados_total counter",
+        f"logs_descartados_total {logs.handler_fila.descartados}",
+    ]
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def exportar_metricas():
+    return PlainTextResponse(metricas.registro.texto(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # ------------------- CONEXÃO COM O BANCO -------------------
 def get_db():
@@ -42,6 +71,33 @@ def get_db():
     finally:
         db.close()
 
+# ------------------- GROUP COMMIT (opcional) -------------------
+# Com GROUP_COMMIT=1, as inserções concorrentes de POST /transacoes são
+# agrupadas por uma thread escritora e gravadas com um único commit.
+def obter_escritor_agrupado(request: Request) -> Optional[EscritorAgrupado]:
+    return request.app.state.escritor_agrupado
+
+def metricas_escritor_agrupado(escritor_agrupado: EscritorAgrupado):
+    dados = escritor_agrupado.metricas()
+    return [
+        "# TYPE group_commit_lotes_total counter",
+        f"group_commit_lotes_total {dados['lotes']}",
+        "# TYPE group_commit_itens_total counter",
+        f"group_commit_itens_total {dados['itens']}",
+        "# TYPE group_commit_maior_lote gauge",
+        f"group_commit_maior_lote {dados['maior_lote']}",
+        "# TYPE group_commit_espera_maxima_segundos gauge",
+        f"group_commit_espera_maxima_segundos {dados['espera_maxima_ms'] / 1000}",
+        "# TYPE group_commit_pendentes gauge",
+        f"group_commit_pendentes {dados['pendentes']}",
+    ]
+
+@router.get("/group-commit/metricas")
+def metricas_group_commit(escritor_agrupado: Optional[EscritorAgrupado] = Depends(obter_escritor_agrupado)):
+    if escritor_agrupado is None:
+        raise HTTPException(status_code=404, detail="Group commit desativado.")
+    return escritor_agrupado.metricas()
+
 # ------------------- MODELO DE TRANSAÇÃO (Pydantic) -------------------
 class TransacaoCreate(BaseModel):
     tipo: str
@@ -56,92 +112,285 @@ class TransacaoCreate(BaseModel):
 
     @validator('valor')
     def validar_valor(cls, v):
+        if not math.isfinite(v):
+            raise ValueError('O valor precisa ser um número finito.')
         if v <= 0:
             raise ValueError('O valor precisa ser maior que zero.')
+        if v > crud.VALOR_MAXIMO:
+            raise ValueError(f'O valor precisa ser no máximo {crud.VALOR_MAXIMO:.0f}.')
         return v
 
 # ------------------- ENDPOINTS DE TRANSAÇÃO -------------------
-@app.post("/transacoes")
-def criar_transacao(transacao: TransacaoCreate, db: Session = Depends(get_db)):
+def registrar_operacao(mensagem: str, inicio: float, tipo: str, valor: float, usuario_id: int, **extra):
+    """Registra a operação com campos estruturados; nada é montado se o nível INFO estiver desligado."""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(mensagem, extra={"tipo": tipo, "valor": valor, "usuario_id": usuario_id,
+                                     "duracao_ms": round((time.perf_counter() - inicio) * 1000, 3), **extra})
+
+@router.post("/transacoes", response_class=RespostaOrjson)
+def criar_transacao(transacao: TransacaoCreate, db: Session = Depends(get_db),
+                    escritor_agrupado: Optional[EscritorAgrupado] = Depends(obter_escritor_agrupado)):
+    inicio = time.perf_counter()
+    linha = {"tipo": transacao.tipo, "valor": transacao.valor, "usuario_id": transacao.usuario_id}
     try:
-        db_transacao = Transacao(tipo=transacao.tipo,
-                                 valor=transacao.valor,
-                                 usuario_id=transacao.usuario_id)
-        db.add(db_transacao)
-        db.commit()
-        db.refresh(db_transacao)
-        return {"mensagem": "Transação criada com sucesso!", "transacao": db_transacao}
+        if escritor_agrupado is not None:
+            linha["id"] = escritor_agrupado.inserir(linha)
+        else:
+            linha["id"] = crud.inserir_transacoes(db, [linha])[0]
+            db.commit()
+        registrar_operacao("Nova transação criada", inicio, transacao.tipo, transacao.valor, transacao.usuario_id, transacao_id=linha["id"])
+        return RespostaOrjson({"mensagem": "Transação criada com sucesso!", "transacao": linha})
     except IntegrityError:
         db.rollback()
         raise HTTPException(status_code=400, detail="Erro de integridade no banco de dados.")
     except SQLAlchemyError as e:
         db.rollback()
-        logging.error(f"Erro no banco de dados: {str(e)}")
+        logger.error("Erro no banco de dados: %s", e)
         raise HTTPException(status_code=500, detail="Erro ao acessar o banco de dados.")
+    except (EscritorEncerrado, EsperaEsgotada) as e:
+        logger.error("Transação não gravada pelo group commit: %s", e)
+        raise HTTPException(status_code=503, detail="Serviço indisponível para gravar a transação.")
+
+LOTE_MAXIMO = 10000
+
+@router.post("/transacoes/lote")
+def criar_transacoes_lote(itens: List[Any] = Body(..., max_length=LOTE_MAXIMO), db: Session = Depends(get_db)):
+    """Cria várias transações em uma única transação do banco.
+
+    Os itens inválidos não impedem a gravação dos válidos; cada um é
+    devolvido em "erros" com a posição que ocupava na lista enviada.
+    """
+    inicio = time.perf_counter()
+    validas = []
+    erros = []
+    for indice, item in enumerate(itens):
+        if not isinstance(item, dict):
+            erros.append({"indice": indice, "erros": ["O item deve ser um objeto JSON."]})
+            continue
+        try:
+            transacao = TransacaoCreate(**item)
+        except ValidationError as e:
+            erros.append({"indice": indice, "erros": [erro["msg"] for erro in e.errors()]})
+            continue
+        validas.append({"tipo": transacao.tipo, "valor": transacao.valor, "usuario_id": transacao.usuario_id})
 
-@app.get("/transacoes")
-def listar_transacoes(db: Session = Depends(get_db)):
-    transacoes = db.query(Transacao).all()
-    return {"mensagem": "Todas as transações", "transacoes": transacoes}
+    ids = []
+    if validas:
+        try:
+            ids = crud.inserir_transacoes(db, validas)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error("Erro no banco de dados: %s", e)
+            raise HTTPException(status_code=500, detail="Erro ao acessar o banco de dados.")
 
-@app.get("/transacoes/{usuario_id}")
-def transacoes_usuario(usuario_id: str, db: Session = Depends(get_db)):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Lote de transações criado", extra={"quantidade": len(ids), "invalidas": len(erros),
+                                                        "duracao_ms": round((time.perf_counter() - inicio) * 1000, 3)})
+    return {"mensagem": f"{len(ids)} transações criadas com sucesso!", "ids": ids, "erros": erros}
+
+@router.get("/transacoes/{usuario_id}/resumo", response_class=RespostaOrjson)
+def resumo_transacoes_usuario(usuario_id: int, agrupamento: Literal["dia", "mes"] = "mes", db: Session = Depends(get_db)):
+    """Totais e quantidades por tipo e por dia ou mês, lidos da tabela de resumo."""
+    resumo = crud.resumo_usuario(db, usuario_id, agrupamento)
+    return RespostaOrjson({"mensagem": f"Resumo das transações do usuário {usuario_id}", "usuario_id": usuario_id,
+                           "agrupamento": agrupamento, **resumo})
+
+# Paginação por cursor: o cliente envia o último id recebido em "after_id".
+# A consulta usa "id > after_id ORDER BY id LIMIT n", resolvida pela chave
+# primária (ou pelo índice de usuario_id, que no SQLite já inclui o rowid),
+# então o custo de cada página não cresce com o tamanho da tabela.
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+TAMANHO_LOTE_STREAM = 1000
+codificar_transacao_arquivada = codificador_linhas(("id", "tipo", "valor", "usuario_id", "criada_em"))
+
+def consulta_transacoes(db: Session, usuario_id: Optional[int] = None, after_id: Optional[int] = None):
+    consulta = db.query(Transacao.id, Transacao.tipo, Transacao.valor, Transacao.usuario_id)
+    if usuario_id is not None:
+        consulta = consulta.filter(Transacao.usuario_id == usuario_id)
+    if after_id is not None:
+        consulta = consulta.filter(Transacao.id > after_id)
+    return consulta.order_by(Transacao.id)
+
+def pagina_transacoes(db: Session, mensagem: str, usuario_id: Optional[int], after_id: Optional[int], limit: int):
+    linhas = consulta_transacoes(db, usuario_id, after_id).limit(limit).all()
+    transacoes = [codificar_transacao(linha) for linha in linhas]
+    proximo = transacoes[-1]["id"] if len(transacoes) == limit else None
+    # Retornar a resposta pronta evita que o FastAPI percorra o conteúdo no jsonable_encoder
+    return RespostaOrjson({"mensagem": mensagem, "transacoes": transacoes, "proximo_after_id": proximo})
+
+def stream_transacoes(usuario_id: Optional[int], after_id: Optional[int]):
+    """Gera o NDJSON linha a linha, lendo o banco em lotes com yield_per.
+
+    Usa uma sessão própria porque o gerador é consumido depois que o
+    endpoint retorna.
+    """
+    db = SessionLocal()
+    try:
+        for linha in consulta_transacoes(db, usuario_id, after_id).yield_per(TAMANHO_LOTE_STREAM):
+            yield ndjson_transacao(linha)
+    finally:
+        db.close()
+
+@router.get("/transacoes", response_class=RespostaOrjson)
+def listar_transacoes(after_id: Optional[int] = None,
+                      limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+                      formato: Literal["json", "ndjson"] = "json",
+                      db: Session = Depends(get_db)):
+    if formato == "ndjson":
+        # Exportação completa a partir de after_id, sem limite de página
+        return StreamingResponse(stream_transacoes(None, after_id), media_type="application/x-ndjson")
+    return pagina_transacoes(db, "Todas as transações", None, after_id, limit)
+
+@router.get("/transacoes/{usuario_id}", response_class=RespostaOrjson)
+def transacoes_usuario(usuario_id: str,
+                       after_id: Optional[int] = None,
+                       limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+                       formato: Literal["json", "ndjson"] = "json",
+                       db: Session = Depends(get_db)):
     if not usuario_id.isdigit():
         raise HTTPException(status_code=400, detail="O ID do usuário deve ser um número inteiro válido.")
 
     usuario_id = int(usuario_id)
-    transacoes_usuario = db.query(Transacao).filter(Transacao.usuario_id == usuario_id).all()
+    if formato == "ndjson":
+        return StreamingResponse(stream_transacoes(usuario_id, after_id), media_type="application/x-ndjson")
+    return pagina_transacoes(db, f"Transações do usuário {usuario_id}", usuario_id, after_id, limit)
 
-    transacoes_formatadas = [
-        {"id": t.id, "tipo": t.tipo, "valor": t.valor, "usuario_id": t.usuario_id}
-        for t in transacoes_usuario
-    ]
+# ------------------- TRANSAÇÕES ARQUIVADAS -------------------
+@router.get("/arquivo/transacoes", response_class=RespostaOrjson)
+def listar_transacoes_arquivadas(request: Request,
+                                 usuario_id: Optional[int] = None,
+                                 desde: Optional[date] = None,
+                                 ate: Optional[date] = None,
+                                 after_id: Optional[int] = None,
+                                 limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO)):
+    """Consulta as transações movidas pelo arquivar.py, abrindo só as partições do período."""
+    pasta = request.app.state.configuracoes.pasta_arquivo
+    linhas = particoes.consultar(pasta, usuario_id, desde, ate, after_id, limit)
+    transacoes = [codificar_transacao_arquivada(linha) for linha in linhas]
+    proximo = transacoes[-1]["id"] if len(transacoes) == limit else None
+    return RespostaOrjson({"mensagem": "Transações arquivadas", "transacoes": transacoes, "proximo_after_id": proximo})
 
-    return {"mensagem": f"Transações do usuário {usuario_id}", "transacoes": transacoes_formatadas}
+# ------------------- CONTAS BANCÁRIAS -------------------
+@router.get("/contas", response_class=RespostaOrjson)
+def get_contas(db: Session = Depends(get_db)):
+    contas = db.query(Conta.id, Conta.saldo).order_by(Conta.id).all()
+    return RespostaOrjson([{"usuario_id": uid, "saldo": saldo} for uid, saldo in contas])
 
-# ------------------- MODELO DE CONTAS BANCÁRIAS (Simulação) -------------------
-contas_bancarias_db: Dict[int, float] = {
-    1: 1000.50,
-    2: 5000.00
-}
-
-@app.get("/contas")
-def get_contas():
-    return [{"usuario_id": uid, "saldo": saldo} for uid, saldo in contas_bancarias_db.items()]
-
-@app.get("/saldo/{usuario_id}")
-def get_saldo(usuario_id: int):
-    if usuario_id not in contas_bancarias_db:
+@router.get("/saldo/{usuario_id}", response_class=RespostaOrjson)
+def get_saldo(usuario_id: int, db: Session = Depends(get_db)):
+    saldo = db.query(Conta.saldo).filter(Conta.id == usuario_id).scalar()
+    if saldo is None:
         raise HTTPException(status_code=404, detail="Usuário não encontrado.")
-    return {"usuario_id": usuario_id, "saldo": contas_bancarias_db[usuario_id]}
+    return RespostaOrjson({"usuario_id": usuario_id, "saldo": saldo})
 
-@app.post("/transferencia")
-def post_transferencia(usuario_origem: int, usuario_destino: int, valor: float):
-    if usuario_origem not in contas_bancarias_db or usuario_destino not in contas_bancarias_db:
-        raise HTTPException(status_code=404, detail="Usuário não encontrado.")
-    if contas_bancarias_db[usuario_origem] < valor:
-        raise HTTPException(status_code=400, detail="Saldo insuficiente para realizar a transferência.")
-    contas_bancarias_db[usuario_origem] -= valor
-    contas_bancarias_db[usuario_destino] += valor
+@router.post("/transferencia")
+def post_transferencia(usuario_origem: int, usuario_destino: int,
+                       valor: float = Query(..., gt=0, le=crud.VALOR_MAXIMO, allow_inf_nan=False),
+                       db: Session = Depends(get_db)):
+    inicio = time.perf_counter()
+    try:
+        if not crud.debitar(db, usuario_origem, valor):
+            db.rollback()
+            if not crud.conta_existe(db, usuario_origem):
+                raise HTTPException(status_code=404, detail="Usuário não encontrado.")
+            raise HTTPException(status_code=400, detail="Saldo insuficiente para realizar a transferência.")
+        if not crud.creditar(db, usuario_destino, valor):
+            db.rollback()
+            raise HTTPException(status_code=404, detail="Usuário não encontrado.")
+        crud.registrar_transacao(db, "transferencia_enviada", valor, usuario_origem)
+        crud.registrar_transacao(db, "transferencia_recebida", valor, usuario_destino)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error("Erro no banco de dados: %s", e)
+        raise HTTPException(status_code=500, detail="Erro ao acessar o banco de dados.")
+    registrar_operacao("Transferência realizada", inicio, "transferencia", valor, usuario_origem, usuario_destino=usuario_destino)
     return {"mensagem": f"Transferência de {valor} realizada com sucesso!"}
 
 # ------------------- ENDPOINTS DE DEPÓSITO E RETIRADA -------------------
-@app.post("/deposito")
-def deposito(usuario_id: int, valor: float, db: Session = Depends(get_db)):
-    if valor <= 0:
-        raise HTTPException(status_code=400, detail="O valor do depósito precisa ser maior que zero.")
-    if usuario_id not in contas_bancarias_db:
-        raise HTTPException(status_code=404, detail="Usuário não encontrado.")
-    contas_bancarias_db[usuario_id] += valor
+@router.post("/deposito")
+def deposito(usuario_id: int, valor: float = Query(..., gt=0, le=crud.VALOR_MAXIMO, allow_inf_nan=False),
+             db: Session = Depends(get_db)):
+    inicio = time.perf_counter()
+    try:
+        if not crud.creditar(db, usuario_id, valor):
+            db.rollback()
+            raise HTTPException(status_code=404, detail="Usuário não encontrado.")
+        crud.registrar_transacao(db, "deposito", valor, usuario_id)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error("Erro no banco de dados: %s", e)
+        raise HTTPException(status_code=500, detail="Erro ao acessar o banco de dados.")
+    registrar_operacao("Depósito realizado", inicio, "deposito", valor, usuario_id)
     return {"mensagem": f"Depósito de {valor} realizado com sucesso para o usuário {usuario_id}."}
 
-@app.post("/retirada")
-def retirada(usuario_id: int, valor: float, db: Session = Depends(get_db)):
-    if valor <= 0:
-        raise HTTPException(status_code=400, detail="O valor da retirada precisa ser maior que zero.")
-    if usuario_id not in contas_bancarias_db:
-        raise HTTPException(status_code=404, detail="Usuário não encontrado.")
-    if contas_bancarias_db[usuario_id] < valor:
-        raise HTTPException(status_code=400, detail="Saldo insuficiente para realizar a retirada.")
-    contas_bancarias_db[usuario_id] -= valor
+@router.post("/retirada")
+def retirada(usuario_id: int, valor: float = Query(..., gt=0, le=crud.VALOR_MAXIMO, allow_inf_nan=False),
+             db: Session = Depends(get_db)):
+    inicio = time.perf_counter()
+    try:
+        if not crud.debitar(db, usuario_id, valor):
+            db.rollback()
+            if not crud.conta_existe(db, usuario_id):
+                raise HTTPException(status_code=404, detail="Usuário não encontrado.")
+            raise HTTPException(status_code=400, detail="Saldo insuficiente para realizar a retirada.")
+        crud.registrar_transacao(db, "retirada", valor, usuario_id)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error("Erro no banco de dados: %s", e)
+        raise HTTPException(status_code=500, detail="Erro ao acessar o banco de dados.")
+    registrar_operacao("Retirada realizada", inicio, "retirada", valor, usuario_id)
     return {"mensagem": f"Retirada de {valor} realizada com sucesso para o usuário {usuario_id}."}
+
+# ------------------- CRIAÇÃO DA APLICAÇÃO -------------------
+def create_app(configuracoes: Optional[Configuracoes] = None) -> FastAPI:
+    """Monta a aplicação sem tocar no banco.
+
+    O que tem custo ou efeito colateral (migrações, thread de logs, thread
+    do group commit) roda no lifespan, quando o servidor sobe, e só se
+    estiver ligado nas `configuracoes`.
+    """
+    configuracoes = configuracoes or Configuracoes.do_ambiente()
+
+    @asynccontextmanager
+    async def ciclo_de_vida(app: FastAPI):
+        if configuracoes.configurar_logs:
+            logs.configurar_logs(arquivo=configuracoes.log_arquivo)
+        if configuracoes.migrar:
+            # Cria/atualiza as tabelas no banco de dados e as contas iniciais
+            aplicar_migracoes(engine)
+            with SessionLocal() as db:
+                crud.criar_contas_iniciais(db)
+
+        coletor = None
+        if configuracoes.group_commit:
+            escritor = EscritorAgrupado(SessionLocal, janela_ms=configuracoes.group_commit_janela_ms,
+                                        max_itens=configuracoes.group_commit_max_itens)
+            escritor.iniciar()
+            app.state.escritor_agrupado = escritor
+            coletor = metricas.registro.coletor(partial(metricas_escritor_agrupado, escritor))
+        try:
+            yield
+        finally:
+            if app.state.escritor_agrupado is not None:
+                app.state.escritor_agrupado.parar()
+                app.state.escritor_agrupado = None
+            if coletor is not None:
+                metricas.registro.remover_coletor(coletor)
+            if configuracoes.configurar_logs:
+                logs.parar_logs()
+
+    app = FastAPI(lifespan=ciclo_de_vida)
+    app.state.configuracoes = configuracoes
+    app.state.escritor_agrupado = None
+    app.middleware("http")(middleware_tratamento_erros)
+    app.include_router(router)
+    metricas.instrumentar_engine(engine)
+    return app
+
+# Aplicação usada pelo `uvicorn main:app`, configurada pelas variáveis de ambiente
+app = create_app()
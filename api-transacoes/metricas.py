@@ -0,0 +1,218 @@
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from sqlalchemy import event
+
+# Limites (em segundos) dos buckets dos histogramas de latência
+LIMITES_PADRAO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+TIPOS_SQL = {"SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA", "BEGIN", "COMMIT", "ROLLBACK"}
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _rotulos(nomes: Tuple[str, ...], valores: Tuple[str, ...], extra: str = "") -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero(valor: float) -> str:
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+
+class Contador:
+    """Contador monotônico com rótulos, no formato do Prometheus."""
+
+    def __init__(self, nome: str, descricao: str, rotulos: Tuple[str, ...] = ()):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = rotulos
+        self._valores: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *valores_rotulos: str, quantidade: float = 1.0) -> None:
+        with self._lock:
+            self._valores[valores_rotulos] = self._valores.get(valores_rotulos, 0.0) + quantidade
+
+    def linhas(self) -> List[str]:
+        saida = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} counter"]
+        with self._lock:
+            itens = list(self._valores.items())
+        for valores, total in itens:
+            saida.append(f"{self.nome}{_rotulos(self.rotulos, valores)} {_numero(total)}")
+        return saida
+
+
+class Histograma:
+    """Histograma com buckets fixos, no formato do Prometheus.
+
+    Cada observação custa uma busca binária nos limites e um incremento
+    sob lock; os valores acumulados só são calculados na exportação.
+    """
+
+    def __init__(self, nome: str, descricao: str, rotulos: Tuple[str, ...] = (), limites: Tuple[float, ...] = LIMITES_PADRAO):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = rotulos
+        self.limites = limites
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, *valores_rotulos: str) -> None:
+        indice = bisect_left(self.limites, valor)
+        with self._lock:
+            serie = self._series.get(valores_rotulos)
+            if serie is None:
+                # [contagens por bucket (+Inf no fim), soma, total]
+                serie = self._series[valores_rotulos] = [[0] * (len(self.limites) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def linhas(self) -> List[str]:
+        saida = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} histogram"]
+        with self._lock:
+            itens = [(valores, (list(contagens), soma, total)) for valores, (contagens, soma, total) in self._series.items()]
+        for valores, (contagens, soma, total) in itens:
+            acumulado = 0
+            for limite, quantidade in zip(self.limites, contagens):
+                acumulado += quantidade
+                rotulos = _rotulos(self.rotulos, valores, f'le="{limite}"')
+                saida.append(f"{self.nome}_bucket{rotulos} {acumulado}")
+            rotulos = _rotulos(self.rotulos, valores, 'le="+Inf"')
+            saida.append(f"{self.nome}_bucket{rotulos} {total}")
+            saida.append(f"{self.nome}_sum{_rotulos(self.rotulos, valores)} {_numero(soma)}")
+            saida.append(f"{self.nome}_count{_rotulos(self.rotulos, valores)} {total}")
+        return saida
+
+
+class Registro:
+    """Reúne as métricas e gera o texto exposto em /metrics."""
+
+    def __init__(self):
+        self._metricas: list = []
+        self._coletores: List[Callable[[], Iterable[str]]] = []
+
+    def registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def coletor(self, funcao: Callable[[], Iterable[str]]):
+        """Registra uma função que gera linhas extras na hora da exportação."""
+        self._coletores.append(funcao)
+        return funcao
+
+    def remover_coletor(self, funcao: Callable[[], Iterable[str]]) -> None:
+        self._coletores.remove(funcao)
+
+    def texto(self) -> str:
+        linhas: List[str] = []
+        for metrica in self._metricas:
+            linhas.extend(metrica.linhas())
+        for coletor in self._coletores:
+            linhas.extend(coletor())
+        return "\n".join(linhas) + "\n"
+
+
+registro = Registro()
+
+# Engines que já receberam os eventos de métricas
+_engines_instrumentados: "weakref.WeakSet" = weakref.WeakSet()
+
+requisicoes_http = registro.registrar(Contador(
+    "http_requisicoes_total", "Requisições HTTP atendidas.", ("metodo", "rota", "status")))
+duracao_http = registro.registrar(Histograma(
+    "http_requisicao_duracao_segundos", "Tempo de resposta das requisições HTTP.", ("metodo", "rota")))
+consultas_sql = registro.registrar(Contador(
+    "sql_consultas_total", "Comandos SQL executados.", ("tipo",)))
+erros_sql = registro.registrar(Contador(
+    "sql_consultas_erros_total", "Comandos SQL que terminaram com erro.", ("tipo",)))
+duracao_sql = registro.registrar(Histograma(
+    "sql_consulta_duracao_segundos", "Tempo de execução dos comandos SQL.", ("tipo",)))
+espera_pool = registro.registrar(Histograma(
+    "sql_pool_espera_checkout_segundos", "Tempo para obter uma conexão do pool."))
+
+
+def rota_da_requisicao(scope: dict) -> str:
+    """Usa o caminho declarado da rota (ex.: /saldo/{usuario_id}) para não explodir a cardinalidade."""
+    rota = scope.get("route")
+    return getattr(rota, "path", "desconhecida")
+
+
+def registrar_requisicao(metodo: str, rota: str, status: int, duracao: float) -> None:
+    requisicoes_http.inc(metodo, rota, str(status))
+    duracao_http.observar(duracao, metodo, rota)
+
+
+def _tipo_comando(comando: str) -> str:
+    partes = comando.lstrip().split(None, 1)
+    tipo = partes[0].upper() if partes else ""
+    return tipo if tipo in TIPOS_SQL else "OUTRO"
+
+
+def instrumentar_engine(engine) -> None:
+    """Liga as métricas de SQL e de espera do pool ao engine informado (uma vez por engine)."""
+    if engine in _engines_instrumentados:
+        return
+    _engines_instrumentados.add(engine)
+
+    # O início fica no próprio contexto de execução: um comando que falha não
+    # dispara o after_cursor_execute e não deixa sobra na conexão do pool.
+    @event.listens_for(engine, "before_cursor_execute")
+    def antes_de_executar(conn, cursor, statement, parameters, context, executemany):
+        context._inicio_consulta = time.perf_counter()
+
+    def registrar_consulta(context, statement: str) -> str:
+        tipo = _tipo_comando(statement)
+        consultas_sql.inc(tipo)
+        inicio = getattr(context, "_inicio_consulta", None)
+        if inicio is not None:
+            duracao_sql.observar(time.perf_counter() - inicio, tipo)
+        return tipo
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def depois_de_executar(conn, cursor, statement, parameters, context, executemany):
+        registrar_consulta(context, statement)
+
+    @event.listens_for(engine, "handle_error")
+    def ao_falhar(contexto_erro):
+        if contexto_erro.execution_context is None or contexto_erro.statement is None:
+            return
+        erros_sql.inc(registrar_consulta(contexto_erro.execution_context, contexto_erro.statement))
+
+    # O SQLAlchemy não tem evento "antes do checkout", então o tempo de
+    # espera é medido envolvendo `_do_get`, o método interno do pool que
+    # entrega a conexão (esperando na fila quando o pool está esgotado).
+    # Ele existe em todas as classes de pool do SQLAlchemy 1.4 a 2.1
+    # (QueuePool, AsyncAdaptedQueuePool, SingletonThreadPool, StaticPool,
+    # NullPool, AssertionPool). Um pool sem esse método só fica sem a
+    # métrica de espera. Um `engine.dispose()` cria outro pool, que também
+    # fica sem a medição.
+    pool = engine.pool
+    obter_conexao = getattr(pool, "_do_get", None)
+    if callable(obter_conexao):
+        def obter_conexao_medindo():
+            inicio = time.perf_counter()
+            try:
+                return obter_conexao()
+            finally:
+                espera_pool.observar(time.perf_counter() - inicio)
+
+        pool._do_get = obter_conexao_medindo
+
+    @registro.coletor
+    def conexoes_em_uso():
+        if not hasattr(pool, "checkedout"):
+            return []
+        return [
+            "# HELP sql_pool_conexoes_em_uso Conexões retiradas do pool no momento.",
+            "# TYPE sql_pool_conexoes_em_uso gauge",
+            f"sql_pool_conexoes_em_uso {pool.checkedout()}",
+        ]
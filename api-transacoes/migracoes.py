@@ -0,0 +1,30 @@
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+from database import Base
+from models import Transacao
+import crud
+
+def aplicar_migracoes(engine) -> None:
+    """Cria as tabelas que faltam e atualiza bancos criados por versões anteriores.
+
+    O `create_all` só cria tabelas inexistentes; colunas e índices novos em
+    tabelas que já existiam são adicionados aqui.
+    """
+    inspetor = inspect(engine)
+    resumo_existia = inspetor.has_table("resumo_transacoes")
+    Base.metadata.create_all(bind=engine)
+
+    colunas = {coluna["name"] for coluna in inspect(engine).get_columns("transacoes")}
+    with engine.begin() as conn:
+        if "criada_em" not in colunas:
+            conn.exec_driver_sql("ALTER TABLE transacoes ADD COLUMN criada_em DATETIME")
+
+    for indice in Transacao.__table__.indexes:
+        indice.create(bind=engine, checkfirst=True)
+
+    # O resumo é incremental; ao surgir em um banco que já tinha transações,
+    # ele precisa ser calculado uma vez a partir do histórico.
+    if not resumo_existia:
+        with Session(bind=engine) as db:
+            crud.reconstruir_resumo(db)
+            db.commit()
@@ -0,0 +1,10 @@
+from database import SessionLocal, engine
+from migracoes import aplicar_migracoes
+import crud
+
+# Prepara o banco antes de subir a API com MIGRAR_NO_INICIO=0
+aplicar_migracoes(engine)
+with SessionLocal() as db:
+    crud.criar_contas_iniciais(db)
+
+print("Migrações aplicadas com sucesso!")
@@ -1,10 +1,43 @@
-from sqlalchemy import Column, Integer, String, Float
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index
 from database import Base
 
 class Transacao(Base):
     __tablename__ = "transacoes"
+    __table_args__ = (
+        # Atende os filtros por usuário e tipo do resumo sem ler a tabela toda
+        Index("ix_transacoes_usuario_tipo", "usuario_id", "tipo"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     tipo = Column(String, index=True)
     valor = Column(Float)
     usuario_id = Column(Integer, index=True)
+    criada_em = Column(DateTime, default=datetime.utcnow, index=True)
+
+class Conta(Base):
+    __tablename__ = "contas"
+
+    # O id da conta é o próprio id do usuário
+    id = Column(Integer, primary_key=True, index=True)
+    saldo = Column(Float, nullable=False, default=0.0)
+
+class ResumoTransacao(Base):
+    """Totais diários por usuário e tipo, atualizados a cada transação gravada."""
+    __tablename__ = "resumo_transacoes"
+
+    usuario_id = Column(Integer, primary_key=True)
+    tipo = Column(String, primary_key=True)
+    # Dia no formato AAAA-MM-DD (UTC); vazio para transações antigas, sem data
+    dia = Column(String(10), primary_key=True)
+    quantidade = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0.0)
+
+class CheckpointCarga(Base):
+    """Progresso de uma importação do carga.py, gravado no mesmo commit de cada lote."""
+    __tablename__ = "cargas_checkpoint"
+
+    arquivo = Column(String, primary_key=True)
+    tabela = Column(String, primary_key=True)
+    # Registros lidos do arquivo (válidos ou não) já confirmados no banco
+    registros = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,155 @@
+import glob
+import heapq
+import os
+import sqlite3
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Cada mês arquivado vira um arquivo SQLite próprio: transacoes-AAAA-MM.db
+PREFIXO = "transacoes-"
+SUFIXO = ".db"
+
+ESQUEMA_PARTICAO = """
+CREATE TABLE IF NOT EXISTS {esquema}.transacoes (
+    id INTEGER PRIMARY KEY,
+    tipo VARCHAR,
+    valor FLOAT,
+    usuario_id INTEGER,
+    criada_em DATETIME
+);
+CREATE INDEX IF NOT EXISTS {esquema}.ix_transacoes_usuario_id ON transacoes (usuario_id);
+"""
+
+
+def caminho_particao(pasta: str, mes: str) -> str:
+    return os.path.join(pasta, f"{PREFIXO}{mes}{SUFIXO}")
+
+
+def _proximo_mes(mes: str) -> str:
+    ano, numero = map(int, mes.split("-"))
+    return f"{ano + numero // 12}-{numero % 12 + 1:02d}"
+
+
+def _mes_de(data: date) -> str:
+    return f"{data.year}-{data.month:02d}"
+
+
+def meses_arquivados(pasta: str) -> List[str]:
+    """Lista os meses (AAAA-MM) que já possuem partição, em ordem."""
+    arquivos = glob.glob(os.path.join(pasta, f"{PREFIXO}*{SUFIXO}"))
+    return sorted(os.path.basename(arquivo)[len(PREFIXO):-len(SUFIXO)] for arquivo in arquivos)
+
+
+# ------------------- ARQUIVAMENTO -------------------
+def arquivar(caminho_banco: str, pasta: str, antes_de: date, lote: int = 10000, vacuum: bool = True) -> Dict[str, int]:
+    """Move as transações com criada_em anterior a `antes_de` para as partições mensais.
+
+    Cada lote de até `lote` linhas é copiado e apagado na mesma transação,
+    então a memória usada não depende do tamanho da tabela. A cópia usa
+    INSERT OR IGNORE pela chave primária: se o processo for interrompido,
+    basta rodar de novo. Transações sem data (anteriores à coluna
+    criada_em) permanecem na tabela principal.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    corte = antes_de.isoformat()
+    movidas: Dict[str, int] = {}
+
+    conexao = sqlite3.connect(caminho_banco, isolation_level=None)
+    try:
+        conexao.execute("PRAGMA busy_timeout=5000")
+        meses = [mes for (mes,) in conexao.execute(
+            "SELECT DISTINCT strftime('%Y-%m', criada_em) FROM transacoes "
+            "WHERE criada_em IS NOT NULL AND criada_em < ? ORDER BY 1", (corte,))]
+
+        for mes in meses:
+            inicio = f"{mes}-01"
+            fim = min(f"{_proximo_mes(mes)}-01", corte)
+            conexao.execute("ATTACH DATABASE ? AS particao", (caminho_particao(pasta, mes),))
+            try:
+                conexao.executescript(ESQUEMA_PARTICAO.format(esquema="particao"))
+                total = 0
+                while True:
+                    conexao.execute("BEGIN IMMEDIATE")
+                    limite = conexao.execute(
+                        "SELECT max(id) FROM (SELECT id FROM transacoes WHERE criada_em >= ? AND criada_em < ? "
+                        "ORDER BY id LIMIT ?)", (inicio, fim, lote)).fetchone()[0]
+                    if limite is None:
+                        conexao.execute("COMMIT")
+                        break
+                    filtro = "criada_em >= ? AND criada_em < ? AND id <= ?"
+                    conexao.execute(
+                        "INSERT OR IGNORE INTO particao.transacoes (id, tipo, valor, usuario_id, criada_em) "
+                        f"SELECT id, tipo, valor, usuario_id, criada_em FROM main.transacoes WHERE {filtro}",
+                        (inicio, fim, limite))
+                    total += conexao.execute(f"DELETE FROM main.transacoes WHERE {filtro}", (inicio, fim, limite)).rowcount
+                    conexao.execute("COMMIT")
+                conexao.execute("ANALYZE particao")
+            finally:
+                conexao.execute("DETACH DATABASE particao")
+            movidas[mes] = total
+
+        # Devolve ao sistema o espaço das linhas apagadas e atualiza as estatísticas
+        if movidas and vacuum:
+            conexao.execute("VACUUM")
+        conexao.execute("ANALYZE")
+    finally:
+        conexao.close()
+    return movidas
+
+
+# ------------------- LEITURA -------------------
+def _abrir_leitura(caminho: str) -> sqlite3.Connection:
+    return sqlite3.connect(f"file:{caminho}?mode=ro", uri=True)
+
+
+def consultar(pasta: str, usuario_id: Optional[int] = None, desde: Optional[date] = None, ate: Optional[date] = None,
+              after_id: Optional[int] = None, limit: int = 100) -> List[Tuple]:
+    """Busca transações arquivadas, abrindo só as partições dos meses entre `desde` e `ate`.
+
+    Retorna até `limit` tuplas (id, tipo, valor, usuario_id, criada_em) em
+    ordem de id, paginadas por `after_id` como as listagens da API.
+    """
+    mes_inicial = _mes_de(desde) if desde else None
+    mes_final = _mes_de(ate) if ate else None
+    meses = [mes for mes in meses_arquivados(pasta)
+             if (mes_inicial is None or mes >= mes_inicial) and (mes_final is None or mes <= mes_final)]
+
+    condicoes, parametros = [], []
+    if usuario_id is not None:
+        condicoes.append("usuario_id = ?")
+        parametros.append(usuario_id)
+    if desde is not None:
+        condicoes.append("criada_em >= ?")
+        parametros.append(desde.isoformat())
+    if ate is not None:
+        # `ate` é inclusivo: tudo antes do dia seguinte
+        condicoes.append("date(criada_em) <= ?")
+        parametros.append(ate.isoformat())
+    if after_id is not None:
+        condicoes.append("id > ?")
+        parametros.append(after_id)
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    sql = f"SELECT id, tipo, valor, usuario_id, criada_em FROM transacoes {where} ORDER BY id LIMIT ?"
+
+    # Cada partição devolve no máximo `limit` linhas já ordenadas; o merge
+    # mantém só o necessário para a página.
+    resultados = []
+    for mes in meses:
+        conexao = _abrir_leitura(caminho_particao(pasta, mes))
+        try:
+            resultados.append(conexao.execute(sql, (*parametros, limit)).fetchall())
+        finally:
+            conexao.close()
+    return list(heapq.merge(*resultados))[:limit]
+
+
+def agregados(pasta: str) -> Iterator[Tuple[int, str, str, int, float]]:
+    """Totais (usuario_id, tipo, dia, quantidade, total) de todas as partições, para reconstruir o resumo."""
+    for mes in meses_arquivados(pasta):
+        conexao = _abrir_leitura(caminho_particao(pasta, mes))
+        try:
+            yield from conexao.execute(
+                "SELECT usuario_id, tipo, date(criada_em), count(*), sum(valor) FROM transacoes "
+                "WHERE usuario_id IS NOT NULL AND tipo IS NOT NULL GROUP BY 1, 2, 3")
+        finally:
+            conexao.close()
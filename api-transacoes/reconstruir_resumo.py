@@ -0,0 +1,14 @@
+from database import SessionLocal, engine
+from migracoes import aplicar_migracoes
+import crud
+import os
+import particoes
+
+aplicar_migracoes(engine)
+db = SessionLocal()
+
+# Recalcula os totais diários a partir de todas as transações, incluindo as arquivadas
+linhas = crud.reconstruir_resumo(db, particoes.agregados(os.getenv("ARQUIVO_PASTA", "arquivo")))
+db.commit()
+
+print(f"Resumo reconstruído com sucesso! ({linhas} linhas)")
@@ -1,10 +1,11 @@
 from database import SessionLocal
-from models import Transacao
+from models import ResumoTransacao, Transacao
 
 db = SessionLocal()
 
-# Apaga todas as transações
+# Apaga todas as transações e os totais calculados a partir delas
 db.query(Transacao).delete()
+db.query(ResumoTransacao).delete()
 db.commit()
 
 print("Banco de dados resetado com sucesso!")
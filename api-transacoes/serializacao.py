@@ -0,0 +1,47 @@
+from typing import Any, Callable, Sequence, Tuple
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - o orjson é opcional
+    orjson = None
+    import json
+
+
+def dumps(conteudo: Any) -> bytes:
+    """Serializa para JSON em bytes, com orjson quando disponível."""
+    if orjson is not None:
+        return orjson.dumps(conteudo)
+    return json.dumps(conteudo, ensure_ascii=False, default=str).encode("utf-8")
+
+
+class RespostaOrjson(JSONResponse):
+    """Resposta JSON serializada com orjson.
+
+    Quando o endpoint retorna uma instância desta classe, o FastAPI não
+    passa o conteúdo pelo jsonable_encoder; por isso o conteúdo deve conter
+    apenas tipos simples (dict, list, str, números, None, datetime).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def codificador_linhas(campos: Sequence[str]) -> Callable[[Tuple], dict]:
+    """Cria uma função que converte uma tupla de colunas em dict com os campos informados."""
+    campos = tuple(campos)
+
+    def codificar(linha: Tuple) -> dict:
+        return dict(zip(campos, linha))
+
+    return codificar
+
+
+CAMPOS_TRANSACAO = ("id", "tipo", "valor", "usuario_id")
+codificar_transacao = codificador_linhas(CAMPOS_TRANSACAO)
+
+
+def ndjson_transacao(linha: Tuple) -> bytes:
+    """Uma linha de NDJSON para a tupla (id, tipo, valor, usuario_id)."""
+    return dumps(codificar_transacao(linha)) + b"\n"
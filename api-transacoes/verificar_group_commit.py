@@ -0,0 +1,69 @@
+"""Confere que uma linha inválida não derruba as outras transações do mesmo lote do group commit.
+
+Uso:
+    python verificar_group_commit.py --clientes 8
+
+Envia as transações de vários clientes ao mesmo tempo, dentro da mesma
+janela do escritor agrupado, sendo uma delas com valor NaN (que o banco
+recusa). Só o Future dessa transação pode falhar; as demais precisam ser
+gravadas. Sai com código 1 se não for assim. Roda em um banco SQLite
+temporário, sem tocar no transacoes.db.
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import threading
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clientes", type=int, default=8, help="transações enviadas no mesmo lote")
+    parser.add_argument("--janela-ms", type=float, default=200.0, help="janela do escritor agrupado")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix="verificar_group_commit_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(pasta, 'verificar.db')}"
+
+    # Importa o banco só depois de apontar DATABASE_URL para o arquivo temporário
+    from database import SessionLocal, engine
+    from group_commit import EscritorAgrupado
+    from migracoes import aplicar_migracoes
+    from models import Transacao
+
+    aplicar_migracoes(engine)
+    escritor = EscritorAgrupado(SessionLocal, janela_ms=args.janela_ms, max_itens=args.clientes)
+    escritor.iniciar()
+
+    invalido = 0
+    linhas = [{"tipo": "deposito", "valor": math.nan if i == invalido else float(i), "usuario_id": i + 1}
+              for i in range(args.clientes)]
+    resultados = [None] * len(linhas)
+    largada = threading.Barrier(len(linhas))
+
+    def enviar(indice):
+        largada.wait()
+        try:
+            resultados[indice] = escritor.inserir(linhas[indice])
+        except Exception as e:
+            resultados[indice] = e
+
+    threads = [threading.Thread(target=enviar, args=(i,)) for i in range(len(linhas))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    escritor.parar()
+
+    with SessionLocal() as db:
+        gravadas = db.query(Transacao).count()
+    falhas = [i for i, resultado in enumerate(resultados) if isinstance(resultado, Exception)]
+    print(f"Transações gravadas: {gravadas} de {len(linhas) - 1} válidas; falharam os clientes {falhas}")
+
+    if falhas != [invalido] or gravadas != len(linhas) - 1:
+        print("FALHOU: a linha inválida afetou outras transações do lote")
+        sys.exit(1)
+    print("OK: só a transação inválida falhou")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
-from typing import Optional
+from typing import Dict, Optional, Protocol, Tuple, runtime_checkable
+import hashlib
+import threading
+import time
 
 # Chave secreta para assinar o token JWT
 SECRET_KEY = "super_secret_key"
@@ -21,6 +25,111 @@ fake_users_db = {
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 
+@runtime_checkable
+class RevogacoesTokens(Protocol):
+    """Lista de tokens revogados compartilhada entre processos (ex.: `ContasSQLite`)."""
+
+    def revogar_token(self, chave: bytes, expira_em: float) -> None: ...
+
+    def token_revogado(self, chave: bytes) -> bool: ...
+
+
+class CacheTokens:
+    """Cache LRU de tokens já verificados, seguro para uso entre threads.
+
+    A chave é o SHA-256 do token, então o token em si não fica guardado.
+    Cada entrada expira junto com o "exp" do token. Tokens revogados ficam
+    em uma lista à parte até expirarem, para que não voltem a ser aceitos.
+
+    Com vários workers, a lista local só conhece os logouts feitos no
+    próprio processo. Com `compartilhar_revogacoes`, as revogações também
+    são gravadas em uma lista compartilhada, consultada a cada verificação,
+    inclusive quando o token está no cache.
+    """
+
+    def __init__(self, tamanho_maximo: int = 10000):
+        self.tamanho_maximo = tamanho_maximo
+        self._entradas: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self._revogados: Dict[bytes, float] = {}
+        self._compartilhadas: Optional[RevogacoesTokens] = None
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def compartilhar_revogacoes(self, revogacoes: RevogacoesTokens) -> None:
+        """Passa a gravar e consultar as revogações também em `revogacoes`."""
+        self._compartilhadas = revogacoes
+
+    @staticmethod
+    def _chave(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def buscar(self, token: str) -> Optional[str]:
+        """Retorna o usuário do token se ele estiver no cache e ainda não tiver expirado."""
+        chave = self._chave(token)
+        agora = time.time()
+        if self._compartilhadas is not None and self._compartilhadas.token_revogado(chave):
+            # Revogado por outro processo: sai do cache local também
+            with self._lock:
+                self._entradas.pop(chave, None)
+                self.falhas += 1
+            return None
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                self.falhas += 1
+                return None
+            usuario, expira_em = entrada
+            if expira_em <= agora:
+                del self._entradas[chave]
+                self.falhas += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            return usuario
+
+    def guardar(self, token: str, usuario: str, expira_em: float) -> None:
+        chave = self._chave(token)
+        with self._lock:
+            if chave in self._revogados:
+                return
+            self._entradas[chave] = (usuario, expira_em)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.tamanho_maximo:
+                self._entradas.popitem(last=False)
+
+    def revogar(self, token: str, expira_em: float) -> None:
+        chave = self._chave(token)
+        agora = time.time()
+        with self._lock:
+            self._entradas.pop(chave, None)
+            # Descarta as revogações de tokens que já expiraram de qualquer forma
+            for antiga in [c for c, exp in self._revogados.items() if exp <= agora]:
+                del self._revogados[antiga]
+            self._revogados[chave] = expira_em
+        if self._compartilhadas is not None:
+            self._compartilhadas.revogar_token(chave, expira_em)
+
+    def revogado(self, token: str) -> bool:
+        chave = self._chave(token)
+        with self._lock:
+            if chave in self._revogados:
+                return True
+        return self._compartilhadas is not None and self._compartilhadas.token_revogado(chave)
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "entradas": len(self._entradas),
+                "revogados": len(self._revogados),
+            }
+
+
+cache_tokens = CacheTokens()
+
+
 def criar_token_jwt(dados: dict, expira_em: Optional[timedelta] = None):
     """Gera um token JWT válido."""
     to_encode = dados.copy()
@@ -34,13 +143,34 @@ def criar_token_jwt(dados: dict, expira_em: Optional[timedelta] = None):
     return token_jwt
 
 
+def decodificar_token_jwt(token: str) -> dict:
+    """Decodifica e valida o token JWT, sem passar pelo cache."""
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Token inválido ou expirado")
+
+
 def verificar_token_jwt(token: str = Depends(oauth2_scheme)):
     """Verifica se o token JWT é válido."""
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=401, detail="Token inválido")
+    username = cache_tokens.buscar(token)
+    if username is not None:
         return username
-    except JWTError:
+
+    if cache_tokens.revogado(token):
         raise HTTPException(status_code=401, detail="Token inválido ou expirado")
+
+    payload = decodificar_token_jwt(token)
+    username: str = payload.get("sub")
+    if username is None:
+        raise HTTPException(status_code=401, detail="Token inválido")
+    if payload.get("exp") is not None:
+        cache_tokens.guardar(token, username, float(payload["exp"]))
+    return username
+
+
+def revogar_token_jwt(token: str) -> None:
+    """Invalida o token antes do vencimento (por exemplo, no logout)."""
+    payload = decodificar_token_jwt(token)
+    expira_em = payload.get("exp", time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+    cache_tokens.revogar(token, float(expira_em))
@@ -0,0 +1,309 @@
+"""Benchmark de carga e latência das duas APIs.
+
+Executa cada endpoint com vários níveis de concorrência e mede vazão
+(requisições/s) e latência p50/p95/p99. As requisições passam pelo
+transporte ASGI do httpx (em processo) e/ou por um uvicorn local. O
+resultado sai em JSON e pode ser comparado com um baseline salvo.
+
+Uso:
+    python bench_carga.py --saida resultado.json
+    python bench_carga.py --app raiz --modo asgi --contas 100000 --concorrencia 1 16 64
+    python bench_carga.py --baseline baseline.json --tolerancia 0.2
+
+Apps:
+    raiz        API com JWT (main.py da raiz), contas em memória
+    transacoes  API de transações (api-transacoes/main.py), SQLite temporário
+
+Cada app roda em um subprocesso próprio, porque as duas usam módulos com
+o mesmo nome (main, database, models).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+PASTA_APPS = {
+    "raiz": RAIZ,
+    "transacoes": os.path.join(RAIZ, "api-transacoes"),
+}
+
+
+# ------------------- PREPARAÇÃO DAS APPS -------------------
+def preparar_raiz(contas: int, transacoes: int):
+    """Cadastra as contas em memória e devolve a app e a lista de cenários."""
+    import main
+    from auth import criar_token_jwt
+    from limites import FAIXAS, Limite
+
+    # O transporte ASGI não roda o lifespan, então as contas são abertas aqui;
+    # sob o uvicorn, o lifespan mantém os serviços já preenchidos
+    app = main.create_app()
+    servicos = app.state.servicos = main.abrir_servicos()
+    contas_db = servicos.contas
+
+    # Os limites continuam sendo conferidos, mas altos o bastante para não recusar a carga
+    sem_teto = Limite(float("inf"), 10 ** 9)
+    servicos.limites = contas_db.abrir_limites(faixas={"padrao": {
+        operacao: {janela: sem_teto for janela in janelas} for operacao, janelas in FAIXAS["padrao"].items()
+    }})
+
+    for conta_id in range(3, contas + 1):
+        contas_db.adicionar(conta_id, f"usuario{conta_id}", 1_000_000.0)
+    usuarios = [conta["usuario"] for conta in contas_db.values()]
+
+    # Distribui o histórico entre as contas para que /extrato tenha o que ler
+    aleatorio = random.Random(0)
+    for _ in range(transacoes):
+        contas_db.depositar(aleatorio.choice(usuarios), 1.0)
+
+    tokens = {usuario: {"Authorization": f"Bearer {criar_token_jwt({'sub': usuario})}"} for usuario in usuarios}
+
+    def cabecalho(aleatorio):
+        return tokens[aleatorio.choice(usuarios)]
+
+    cenarios = {
+        "GET /saldo": lambda a: ("GET", "/saldo", {}, cabecalho(a)),
+        "GET /extrato": lambda a: ("GET", "/extrato", {"limite": 50}, cabecalho(a)),
+        "POST /deposito": lambda a: ("POST", "/deposito", {"valor": 10}, cabecalho(a)),
+        "POST /retirada": lambda a: ("POST", "/retirada", {"valor": 1}, cabecalho(a)),
+        "POST /transferencia": lambda a: ("POST", "/transferencia", {"destinatario": a.choice(usuarios), "valor": 1}, cabecalho(a)),
+    }
+    return app, cenarios
+
+
+def preparar_transacoes(contas: int, transacoes: int):
+    """Cria um banco temporário com contas e transações e devolve a app e os cenários."""
+    pasta = tempfile.mkdtemp(prefix="bench_carga_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(pasta, 'bench.db')}"
+
+    from sqlalchemy import insert
+    import crud
+    import main
+    from database import SessionLocal, engine
+    from migracoes import aplicar_migracoes
+    from models import Conta
+
+    # O transporte ASGI não roda o lifespan, então o esquema é criado aqui
+    aplicar_migracoes(engine)
+    aleatorio = random.Random(0)
+    with SessionLocal() as db:
+        crud.criar_contas_iniciais(db)
+        linhas = [{"id": conta_id, "saldo": 1_000_000.0} for conta_id in range(3, contas + 1)]
+        for i in range(0, len(linhas), 10000):
+            db.execute(insert(Conta), linhas[i:i + 10000])
+        for i in range(0, transacoes, 10000):
+            lote = [
+                {"tipo": aleatorio.choice(("deposito", "retirada")), "valor": float(aleatorio.randint(1, 500)), "usuario_id": aleatorio.randint(1, contas)}
+                for _ in range(min(10000, transacoes - i))
+            ]
+            crud.inserir_transacoes(db, lote)
+        db.commit()
+
+    maior_id = max(transacoes, 1)
+    cenarios = {
+        "GET /transacoes": lambda a: ("GET", "/transacoes", {"limit": 100, "after_id": a.randint(0, maior_id)}, {}),
+        "GET /transacoes/{usuario_id}": lambda a: ("GET", f"/transacoes/{a.randint(1, contas)}", {"limit": 100}, {}),
+        "GET /saldo/{usuario_id}": lambda a: ("GET", f"/saldo/{a.randint(1, contas)}", {}, {}),
+        "POST /transacoes": lambda a: ("POST", "/transacoes", {"json": {"tipo": "deposito", "valor": 10.0, "usuario_id": a.randint(1, contas)}}, {}),
+        "POST /deposito": lambda a: ("POST", "/deposito", {"usuario_id": a.randint(1, contas), "valor": 10}, {}),
+        "POST /retirada": lambda a: ("POST", "/retirada", {"usuario_id": a.randint(1, contas), "valor": 1}, {}),
+        "POST /transferencia": lambda a: ("POST", "/transferencia", {"usuario_origem": a.randint(1, contas), "usuario_destino": a.randint(1, contas), "valor": 1}, {}),
+    }
+    return main.app, cenarios
+
+
+PREPARADORES = {"raiz": preparar_raiz, "transacoes": preparar_transacoes}
+
+
+# ------------------- MEDIÇÃO -------------------
+def percentil(ordenados, p: float) -> float:
+    """Percentil pelo método nearest-rank sobre uma lista já ordenada."""
+    if not ordenados:
+        return 0.0
+    indice = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[indice]
+
+
+async def medir(cliente, gerar, concorrencia: int, requisicoes: int, semente: int) -> dict:
+    latencias = []
+    erros = 0
+    restantes = iter(range(requisicoes))
+
+    async def trabalhador(indice: int):
+        nonlocal erros
+        aleatorio = random.Random(semente * 1000 + indice)
+        for _ in restantes:
+            metodo, caminho, parametros, cabecalhos = gerar(aleatorio)
+            corpo = parametros.pop("json", None)
+            inicio = time.perf_counter()
+            try:
+                resposta = await cliente.request(metodo, caminho, params=parametros, json=corpo, headers=cabecalhos)
+                if resposta.status_code >= 500:
+                    erros += 1
+            except Exception:
+                erros += 1
+            latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador(i) for i in range(concorrencia)))
+    duracao = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        "concorrencia": concorrencia,
+        "requisicoes": len(latencias),
+        "erros": erros,
+        "vazao_rps": round(len(latencias) / duracao, 1),
+        "p50_ms": round(percentil(latencias, 50) * 1000, 3),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 3),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 3),
+    }
+
+
+async def executar_cenarios(cliente, cenarios, args, app_nome: str, modo: str) -> list:
+    resultados = []
+    for nome, gerar in cenarios.items():
+        for semente, concorrencia in enumerate(args.concorrencia):
+            resultado = await medir(cliente, gerar, concorrencia, args.requisicoes, semente)
+            resultado = {"app": app_nome, "modo": modo, "endpoint": nome, **resultado}
+            print(f"  {app_nome:<10} {modo:<7} {nome:<30} c={concorrencia:<4} "
+                  f"{resultado['vazao_rps']:>9,.0f} req/s  p50={resultado['p50_ms']:.2f}ms "
+                  f"p95={resultado['p95_ms']:.2f}ms p99={resultado['p99_ms']:.2f}ms", file=sys.stderr)
+            resultados.append(resultado)
+    return resultados
+
+
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rodar_app(args) -> list:
+    """Executa o benchmark de uma única app (chamado dentro do subprocesso)."""
+    import httpx
+    import logging
+
+    pasta = PASTA_APPS[args.app]
+    sys.path.insert(0, pasta)
+    os.chdir(pasta)
+    app, cenarios = PREPARADORES[args.app](args.contas, args.transacoes)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    resultados = []
+    if args.modo in ("asgi", "todos"):
+        async def via_asgi():
+            transporte = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+                return await executar_cenarios(cliente, cenarios, args, args.app, "asgi")
+        resultados += asyncio.run(via_asgi())
+
+    if args.modo in ("uvicorn", "todos"):
+        import uvicorn
+
+        porta = porta_livre()
+        servidor = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=porta, log_level="warning"))
+        thread = threading.Thread(target=servidor.run, daemon=True)
+        thread.start()
+        while not servidor.started:
+            time.sleep(0.05)
+
+        async def via_uvicorn():
+            limites = httpx.Limits(max_connections=max(args.concorrencia))
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{porta}", limits=limites) as cliente:
+                return await executar_cenarios(cliente, cenarios, args, args.app, "uvicorn")
+        try:
+            resultados += asyncio.run(via_uvicorn())
+        finally:
+            servidor.should_exit = True
+            thread.join()
+
+    return resultados
+
+
+# ------------------- BASELINE -------------------
+def comparar(resultados: list, baseline: list, tolerancia: float) -> list:
+    """Lista as medições que pioraram além da tolerância em relação ao baseline."""
+    chave = lambda r: (r["app"], r["modo"], r["endpoint"], r["concorrencia"])
+    anteriores = {chave(r): r for r in baseline}
+    regressoes = []
+    for atual in resultados:
+        anterior = anteriores.get(chave(atual))
+        if anterior is None:
+            continue
+        if atual["p99_ms"] > anterior["p99_ms"] * (1 + tolerancia):
+            regressoes.append({**dict(zip(("app", "modo", "endpoint", "concorrencia"), chave(atual))),
+                               "metrica": "p99_ms", "baseline": anterior["p99_ms"], "atual": atual["p99_ms"]})
+        if atual["vazao_rps"] < anterior["vazao_rps"] * (1 - tolerancia):
+            regressoes.append({**dict(zip(("app", "modo", "endpoint", "concorrencia"), chave(atual))),
+                               "metrica": "vazao_rps", "baseline": anterior["vazao_rps"], "atual": atual["vazao_rps"]})
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga e latência das APIs.")
+    parser.add_argument("--app", choices=["raiz", "transacoes", "todas"], default="todas")
+    parser.add_argument("--modo", choices=["asgi", "uvicorn", "todos"], default="todos")
+    parser.add_argument("--contas", type=int, default=1000, help="contas cadastradas antes da medição")
+    parser.add_argument("--transacoes", type=int, default=10000, help="transações pré-carregadas")
+    parser.add_argument("--concorrencia", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requisicoes", type=int, default=500, help="requisições por endpoint e nível de concorrência")
+    parser.add_argument("--saida", help="arquivo JSON com os resultados (padrão: stdout)")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparação")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="piora relativa aceita antes de acusar regressão")
+    parser.add_argument("--subprocesso", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.subprocesso:
+        json.dump(rodar_app(args), sys.stdout)
+        return
+
+    apps = ["raiz", "transacoes"] if args.app == "todas" else [args.app]
+    resultados = []
+    for app_nome in apps:
+        comando = [sys.executable, os.path.abspath(__file__), "--subprocesso", "--app", app_nome, "--modo", args.modo,
+                   "--contas", str(args.contas), "--transacoes", str(args.transacoes),
+                   "--requisicoes", str(args.requisicoes), "--concorrencia", *map(str, args.concorrencia)]
+        processo = subprocess.run(comando, stdout=subprocess.PIPE, check=True)
+        resultados += json.loads(processo.stdout)
+
+    relatorio = {
+        "meta": {
+            "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "contas": args.contas,
+            "transacoes": args.transacoes,
+            "requisicoes": args.requisicoes,
+        },
+        "resultados": resultados,
+    }
+
+    codigo_saida = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as arquivo:
+            baseline = json.load(arquivo)["resultados"]
+        relatorio["regressoes"] = comparar(resultados, baseline, args.tolerancia)
+        for r in relatorio["regressoes"]:
+            print(f"REGRESSÃO {r['app']} {r['modo']} {r['endpoint']} c={r['concorrencia']}: "
+                  f"{r['metrica']} {r['baseline']} -> {r['atual']}", file=sys.stderr)
+        codigo_saida = 1 if relatorio["regressoes"] else 0
+
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
+    else:
+        print(texto)
+    sys.exit(codigo_saida)
+
+
+if __name__ == "__main__":
+    main()
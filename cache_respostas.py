@@ -0,0 +1,63 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+
+def gerar_etag(epoca: str, versao: int, usuario: str, variante: Hashable) -> str:
+    """ETag de uma resposta: época do armazenamento, versão da conta e resumo do usuário e dos parâmetros."""
+    resumo = hashlib.blake2b(repr((usuario, variante)).encode(), digest_size=6).hexdigest()
+    return f'"{epoca}-{versao}-{resumo}"'
+
+
+def etag_confere(if_none_match: str, etag: str) -> bool:
+    """Confere o cabeçalho If-None-Match (lista de ETags, fracas ou não, ou "*")."""
+    for candidata in if_none_match.split(","):
+        candidata = candidata.strip()
+        if candidata == "*" or candidata.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class CacheRespostas:
+    """Respostas já serializadas por conta, válidas enquanto a versão da conta não muda.
+
+    Cada conta guarda a versão das respostas e os corpos por variante
+    (endpoint e parâmetros). Ao guardar uma resposta de versão mais nova,
+    as da versão anterior são descartadas. As contas ficam em ordem LRU,
+    limitadas a `max_contas`, e cada uma guarda até `variantes_por_conta`
+    respostas.
+    """
+
+    def __init__(self, max_contas: int = 10000, variantes_por_conta: int = 8):
+        self.max_contas = max_contas
+        self.variantes_por_conta = variantes_por_conta
+        self._contas: "OrderedDict[str, Tuple[int, Dict[Hashable, bytes]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def buscar(self, usuario: str, variante: Hashable, versao: int) -> Optional[bytes]:
+        with self._lock:
+            entrada = self._contas.get(usuario)
+            if entrada is None or entrada[0] != versao:
+                return None
+            self._contas.move_to_end(usuario)
+            return entrada[1].get(variante)
+
+    def guardar(self, usuario: str, variante: Hashable, versao: int, corpo: bytes) -> None:
+        with self._lock:
+            entrada = self._contas.get(usuario)
+            if entrada is None or entrada[0] < versao:
+                entrada = self._contas[usuario] = (versao, {})
+            elif entrada[0] > versao:
+                # Resposta montada antes de uma operação mais recente: já nasceu velha
+                return
+            corpos = entrada[1]
+            corpos[variante] = corpo
+            while len(corpos) > self.variantes_por_conta:
+                del corpos[next(iter(corpos))]
+            self._contas.move_to_end(usuario)
+            while len(self._contas) > self.max_contas:
+                self._contas.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._contas)
@@ -0,0 +1,216 @@
+import secrets
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Protocol, Tuple
+
+from historico import HistoricoConta
+from limites import MotorLimites
+from travas import TravasPorConta
+
+
+class ContaNaoEncontrada(Exception):
+    """O usuário informado não possui conta."""
+
+    def __init__(self, usuario: str):
+        super().__init__(usuario)
+        self.usuario = usuario
+
+
+class SaldoInsuficiente(Exception):
+    """A conta não tem saldo para a operação."""
+
+
+class BackendContas(Protocol):
+    """Interface dos armazenamentos de contas e extratos usados pela API.
+
+    `AccountStore` guarda tudo na memória do processo (padrão). `ContasSQLite`
+    (contas_sqlite.py) guarda em um arquivo SQLite compartilhado entre
+    processos, para rodar a API com vários workers.
+
+    Cada conta tem uma versão que cresce a cada depósito, retirada ou
+    transferência. A `epoca` identifica o conteúdo do armazenamento (muda
+    quando ele é recriado), então o par época/versão identifica um estado
+    da conta.
+
+    `abrir_limites` cria o motor de limites por janela (limites.py) que
+    acompanha o armazenamento: em memória no `AccountStore`, no mesmo banco
+    no `ContasSQLite`.
+    """
+
+    epoca: str
+
+    def adicionar(self, conta_id: int, usuario: str, saldo: float = 0.0) -> Any: ...
+
+    def existe_usuario(self, usuario: str) -> bool: ...
+
+    def versao(self, usuario: str) -> int: ...
+
+    def saldo(self, usuario: str) -> float: ...
+
+    def extrato(self, usuario: str, desde: Optional[datetime] = None, ate: Optional[datetime] = None,
+                limite: Optional[int] = None) -> Tuple[List[dict], float]: ...
+
+    def depositar(self, usuario: str, valor: float) -> None: ...
+
+    def retirar(self, usuario: str, valor: float) -> None: ...
+
+    def transferir(self, usuario: str, destinatario: str, valor: float) -> None: ...
+
+    def saldo_total(self) -> float: ...
+
+    def abrir_limites(self, **opcoes) -> MotorLimites: ...
+
+    def __len__(self) -> int: ...
+
+
+def abrir_store(url: Optional[str] = None, contas: Optional[Dict[int, dict]] = None) -> BackendContas:
+    """Cria o armazenamento de contas indicado pela URL.
+
+    Sem URL (ou com "memoria"), usa o `AccountStore` em memória. Com
+    "sqlite:///caminho.db", usa o `ContasSQLite` nesse arquivo; as `contas`
+    iniciais só são criadas se ainda não existirem.
+    """
+    if not url or url == "memoria":
+        return AccountStore(contas)
+    if url.startswith("sqlite:///"):
+        from contas_sqlite import ContasSQLite
+        return ContasSQLite(url[len("sqlite:///"):], contas)
+    raise ValueError(f"Armazenamento de contas não suportado: {url}")
+
+
+class AccountStore:
+    """Armazena as contas bancárias com índices por id e por usuário.
+
+    Todas as buscas são feitas por dicionário, então o custo de localizar
+    uma conta não depende da quantidade de contas cadastradas. As operações
+    que alteram saldo usam um lock por conta (veja `TravasPorConta`), o que
+    permite que operações em contas diferentes rodem em paralelo nas threads
+    do servidor.
+    """
+
+    def __init__(self, contas: Optional[Dict[int, dict]] = None, travas: Optional[TravasPorConta] = None):
+        self._por_id: Dict[int, dict] = {}
+        self._id_por_usuario: Dict[str, int] = {}
+        self._lock_indices = threading.Lock()
+        self.travas = travas or TravasPorConta()
+        # As contas vivem só neste processo: cada instância é uma época nova
+        self.epoca = secrets.token_hex(4)
+        for conta_id, conta in (contas or {}).items():
+            self.adicionar(conta_id, conta["usuario"], conta.get("saldo", 0.0))
+
+    def adicionar(self, conta_id: int, usuario: str, saldo: float = 0.0, transacoes: Optional[HistoricoConta] = None) -> dict:
+        """Cadastra uma nova conta e atualiza os índices."""
+        with self._lock_indices:
+            if conta_id in self._por_id:
+                raise ValueError(f"Conta {conta_id} já cadastrada")
+            if usuario in self._id_por_usuario:
+                raise ValueError(f"Usuário {usuario} já possui conta")
+
+            conta = {
+                "usuario": usuario,
+                "saldo": saldo,
+                "versao": 0,
+                "transacoes": transacoes if transacoes is not None else HistoricoConta()
+            }
+            self._por_id[conta_id] = conta
+            self._id_por_usuario[usuario] = conta_id
+            return conta
+
+    def remover(self, conta_id: int) -> None:
+        """Remove uma conta e suas entradas nos índices."""
+        with self._lock_indices:
+            conta = self._por_id.pop(conta_id)
+            del self._id_por_usuario[conta["usuario"]]
+
+    def buscar(self, conta_id: int) -> Optional[dict]:
+        """Retorna a conta pelo id, ou None se não existir."""
+        return self._por_id.get(conta_id)
+
+    def buscar_por_usuario(self, usuario: str) -> Optional[dict]:
+        """Retorna a conta do usuário, ou None se não existir."""
+        conta_id = self._id_por_usuario.get(usuario)
+        if conta_id is None:
+            return None
+        return self._por_id.get(conta_id)
+
+    def id_por_usuario(self, usuario: str) -> Optional[int]:
+        """Retorna o id da conta do usuário, ou None se não existir."""
+        return self._id_por_usuario.get(usuario)
+
+    def existe_usuario(self, usuario: str) -> bool:
+        return usuario in self._id_por_usuario
+
+    # ------------------- OPERAÇÕES -------------------
+    def _localizar(self, usuario: str):
+        conta_id = self._id_por_usuario.get(usuario)
+        if conta_id is None:
+            raise ContaNaoEncontrada(usuario)
+        return conta_id, self._por_id[conta_id]
+
+    def versao(self, usuario: str) -> int:
+        """Versão atual da conta; muda a cada operação que altera o saldo."""
+        return self._localizar(usuario)[1]["versao"]
+
+    def saldo(self, usuario: str) -> float:
+        conta_id, conta = self._localizar(usuario)
+        with self.travas.travar(conta_id):
+            return conta["saldo"]
+
+    def extrato(self, usuario: str, desde: Optional[datetime] = None, ate: Optional[datetime] = None, limite: Optional[int] = None):
+        """Retorna as transações do período (veja `HistoricoConta.listar`) e o saldo atual."""
+        conta_id, conta = self._localizar(usuario)
+        with self.travas.travar(conta_id):
+            return conta["transacoes"].listar(desde, ate, limite), conta["saldo"]
+
+    def depositar(self, usuario: str, valor: float) -> None:
+        conta_id, conta = self._localizar(usuario)
+        with self.travas.travar(conta_id):
+            conta["saldo"] += valor
+            conta["versao"] += 1
+            conta["transacoes"].registrar("depósito", valor)
+
+    def retirar(self, usuario: str, valor: float) -> None:
+        conta_id, conta = self._localizar(usuario)
+        with self.travas.travar(conta_id):
+            if not conta["saldo"] >= valor:
+                raise SaldoInsuficiente()
+            conta["saldo"] -= valor
+            conta["versao"] += 1
+            conta["transacoes"].registrar("retirada", valor)
+
+    def transferir(self, usuario: str, destinatario: str, valor: float) -> None:
+        """Move o valor entre duas contas, travando ambas na ordem das listras."""
+        id_destino, conta_destino = self._localizar(destinatario)
+        id_origem, conta_origem = self._localizar(usuario)
+        with self.travas.travar(id_origem, id_destino):
+            if not conta_origem["saldo"] >= valor:
+                raise SaldoInsuficiente()
+            conta_origem["saldo"] -= valor
+            conta_destino["saldo"] += valor
+            conta_origem["versao"] += 1
+            conta_destino["versao"] += 1
+            conta_origem["transacoes"].registrar("transferência enviada", valor, destinatario)
+            conta_destino["transacoes"].registrar("transferência recebida", valor, usuario)
+
+    def saldo_total(self) -> float:
+        """Soma dos saldos de todas as contas (sem travar: use com o sistema parado)."""
+        return sum(conta["saldo"] for conta in self._por_id.values())
+
+    def abrir_limites(self, **opcoes) -> MotorLimites:
+        """Motor de limites com os contadores na memória do processo."""
+        return MotorLimites(**opcoes)
+
+    def __contains__(self, conta_id: int) -> bool:
+        return conta_id in self._por_id
+
+    def __len__(self) -> int:
+        return len(self._por_id)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._por_id)
+
+    def values(self):
+        return self._por_id.values()
+
+    def items(self):
+        return self._por_id.items()
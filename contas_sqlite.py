@@ -0,0 +1,318 @@
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from contas import ContaNaoEncontrada, SaldoInsuficiente
+from historico import CODIGO_TIPO, montar_transacao, para_epoch_us
+from limites import FAIXAS, JANELAS, Limite, LimiteExcedido, MotorLimites, balde_atual, validar_valor
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS contas (
+    id INTEGER PRIMARY KEY,
+    usuario TEXT NOT NULL UNIQUE,
+    saldo REAL NOT NULL,
+    transacoes INTEGER NOT NULL DEFAULT 0,
+    ultima_data_us INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS extrato (
+    conta_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    data_us INTEGER NOT NULL,
+    tipo INTEGER NOT NULL,
+    valor REAL NOT NULL,
+    contraparte TEXT,
+    PRIMARY KEY (conta_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_extrato_conta_data ON extrato (conta_id, data_us);
+CREATE TABLE IF NOT EXISTS tokens_revogados (
+    chave BLOB PRIMARY KEY,
+    expira_em REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS limites_faixa (
+    conta_id INTEGER PRIMARY KEY,
+    faixa TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS limites_uso (
+    conta_id INTEGER NOT NULL,
+    operacao TEXT NOT NULL,
+    janela TEXT NOT NULL,
+    balde INTEGER NOT NULL,
+    valor REAL NOT NULL,
+    quantidade INTEGER NOT NULL,
+    PRIMARY KEY (conta_id, operacao, janela, balde)
+) WITHOUT ROWID;
+"""
+
+# Atualiza o saldo e reserva o próximo número do extrato da conta. A data
+# nunca volta no tempo, como no HistoricoConta.
+_MOVIMENTAR = (
+    "UPDATE contas SET saldo = saldo + ?, transacoes = transacoes + 1, ultima_data_us = max(ultima_data_us, ?) "
+    "WHERE id = ? {condicao} RETURNING transacoes, ultima_data_us"
+)
+_CREDITAR = _MOVIMENTAR.format(condicao="")
+_DEBITAR = _MOVIMENTAR.format(condicao="AND saldo >= ?")
+_REGISTRAR = "INSERT INTO extrato (conta_id, seq, data_us, tipo, valor, contraparte) VALUES (?, ?, ?, ?, ?, ?)"
+
+# Uso de uma operação dentro da janela: baldes mais novos que `balde atual - baldes`
+_USO_JANELA = (
+    "SELECT total(valor), total(quantidade) FROM limites_uso "
+    "WHERE conta_id = ? AND operacao = ? AND janela = ? AND balde > ?"
+)
+
+
+class ContasSQLite:
+    """Contas e extratos em um banco SQLite compartilhado entre processos.
+
+    Todos os workers do uvicorn abrem o mesmo arquivo em modo WAL: leituras
+    rodam em paralelo, e cada operação que altera saldo é uma transação
+    `BEGIN IMMEDIATE`, serializada pelo lock de escrita do próprio SQLite
+    entre threads e processos. O saldo é conferido dentro do UPDATE
+    (`saldo >= valor`), então não há janela entre a leitura e a escrita.
+    Cada thread usa sua própria conexão.
+
+    A coluna `transacoes` conta as operações da conta e serve de versão;
+    a época fica gravada no próprio arquivo, então é a mesma em todos os
+    workers. Os tokens revogados no logout também ficam no arquivo
+    (`RevogacoesTokens` do auth.py), para valer em todos os workers.
+    """
+
+    def __init__(self, caminho: str, contas: Optional[Dict[int, dict]] = None):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._ids: Dict[str, int] = {}
+
+        self._conexao().executescript(ESQUEMA)
+        with self._transacao() as conexao:
+            conexao.execute("INSERT OR IGNORE INTO meta (chave, valor) VALUES ('epoca', ?)", (secrets.token_hex(4),))
+            self.epoca = conexao.execute("SELECT valor FROM meta WHERE chave = 'epoca'").fetchone()[0]
+            if contas:
+                conexao.executemany(
+                    "INSERT OR IGNORE INTO contas (id, usuario, saldo) VALUES (?, ?, ?)",
+                    [(conta_id, conta["usuario"], conta.get("saldo", 0.0)) for conta_id, conta in contas.items()])
+
+    def _conexao(self) -> sqlite3.Connection:
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, isolation_level=None, timeout=5.0)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+        return conexao
+
+    @contextmanager
+    def _transacao(self, modo: str = "IMMEDIATE") -> Iterator[sqlite3.Connection]:
+        """Abre uma transação; dentro de outra já aberta nesta thread, participa dela."""
+        conexao = self._conexao()
+        if conexao.in_transaction:
+            yield conexao
+            return
+        conexao.execute(f"BEGIN {modo}")
+        try:
+            yield conexao
+        except BaseException:
+            conexao.execute("ROLLBACK")
+            raise
+        conexao.execute("COMMIT")
+
+    def adicionar(self, conta_id: int, usuario: str, saldo: float = 0.0) -> None:
+        """Cadastra uma nova conta."""
+        try:
+            with self._transacao() as conexao:
+                conexao.execute("INSERT INTO contas (id, usuario, saldo) VALUES (?, ?, ?)", (conta_id, usuario, saldo))
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Conta {conta_id} ou usuário {usuario} já cadastrado")
+
+    def id_por_usuario(self, usuario: str) -> Optional[int]:
+        """Retorna o id da conta do usuário, ou None se não existir."""
+        conta_id = self._ids.get(usuario)
+        if conta_id is None:
+            linha = self._conexao().execute("SELECT id FROM contas WHERE usuario = ?", (usuario,)).fetchone()
+            if linha is None:
+                return None
+            # O id de uma conta não muda, então pode ficar guardado no processo
+            conta_id = self._ids[usuario] = linha[0]
+        return conta_id
+
+    def existe_usuario(self, usuario: str) -> bool:
+        return self.id_por_usuario(usuario) is not None
+
+    # ------------------- TOKENS REVOGADOS -------------------
+    def revogar_token(self, chave: bytes, expira_em: float) -> None:
+        """Grava a revogação (chave = SHA-256 do token) até o token expirar."""
+        with self._transacao() as conexao:
+            # Descarta as revogações de tokens que já expiraram de qualquer forma
+            conexao.execute("DELETE FROM tokens_revogados WHERE expira_em <= ?", (time.time(),))
+            conexao.execute("INSERT OR REPLACE INTO tokens_revogados (chave, expira_em) VALUES (?, ?)", (chave, expira_em))
+
+    def token_revogado(self, chave: bytes) -> bool:
+        return self._conexao().execute("SELECT 1 FROM tokens_revogados WHERE chave = ?", (chave,)).fetchone() is not None
+
+    def abrir_limites(self, **opcoes) -> "LimitesSQLite":
+        """Motor de limites com os contadores neste mesmo banco."""
+        return LimitesSQLite(self, **opcoes)
+
+    # ------------------- OPERAÇÕES -------------------
+    def _localizar(self, usuario: str) -> int:
+        conta_id = self.id_por_usuario(usuario)
+        if conta_id is None:
+            raise ContaNaoEncontrada(usuario)
+        return conta_id
+
+    def versao(self, usuario: str) -> int:
+        """Versão atual da conta; muda a cada operação que altera o saldo."""
+        conta_id = self._localizar(usuario)
+        return self._conexao().execute("SELECT transacoes FROM contas WHERE id = ?", (conta_id,)).fetchone()[0]
+
+    def saldo(self, usuario: str) -> float:
+        conta_id = self._localizar(usuario)
+        return self._conexao().execute("SELECT saldo FROM contas WHERE id = ?", (conta_id,)).fetchone()[0]
+
+    def extrato(self, usuario: str, desde: Optional[datetime] = None, ate: Optional[datetime] = None,
+                limite: Optional[int] = None) -> Tuple[List[dict], float]:
+        """Retorna as transações do período (mesmo formato do `HistoricoConta.listar`) e o saldo atual."""
+        conta_id = self._localizar(usuario)
+        condicoes, parametros = ["conta_id = ?"], [conta_id]
+        if desde is not None:
+            condicoes.append("data_us >= ?")
+            parametros.append(para_epoch_us(desde))
+        if ate is not None:
+            condicoes.append("data_us <= ?")
+            parametros.append(para_epoch_us(ate))
+        sql = f"SELECT seq, data_us, tipo, valor, contraparte FROM extrato WHERE {' AND '.join(condicoes)}"
+
+        # Saldo e extrato lidos no mesmo snapshot
+        with self._transacao("DEFERRED") as conexao:
+            saldo_atual = conexao.execute("SELECT saldo FROM contas WHERE id = ?", (conta_id,)).fetchone()[0]
+            if limite is not None:
+                linhas = conexao.execute(f"{sql} ORDER BY seq DESC LIMIT ?", (*parametros, limite)).fetchall()
+                linhas.reverse()
+            else:
+                linhas = conexao.execute(f"{sql} ORDER BY seq", parametros).fetchall()
+        return [montar_transacao(*linha) for linha in linhas], saldo_atual
+
+    def depositar(self, usuario: str, valor: float) -> None:
+        conta_id = self._localizar(usuario)
+        with self._transacao() as conexao:
+            seq, data_us = conexao.execute(_CREDITAR, (valor, time.time_ns() // 1000, conta_id)).fetchone()
+            conexao.execute(_REGISTRAR, (conta_id, seq, data_us, CODIGO_TIPO["depósito"], valor, None))
+
+    def retirar(self, usuario: str, valor: float) -> None:
+        conta_id = self._localizar(usuario)
+        with self._transacao() as conexao:
+            linha = conexao.execute(_DEBITAR, (-valor, time.time_ns() // 1000, conta_id, valor)).fetchone()
+            if linha is None:
+                raise SaldoInsuficiente()
+            conexao.execute(_REGISTRAR, (conta_id, *linha, CODIGO_TIPO["retirada"], valor, None))
+
+    def transferir(self, usuario: str, destinatario: str, valor: float) -> None:
+        """Debita a origem e credita o destino na mesma transação."""
+        id_destino = self._localizar(destinatario)
+        id_origem = self._localizar(usuario)
+        agora = time.time_ns() // 1000
+        with self._transacao() as conexao:
+            origem = conexao.execute(_DEBITAR, (-valor, agora, id_origem, valor)).fetchone()
+            if origem is None:
+                raise SaldoInsuficiente()
+            destino = conexao.execute(_CREDITAR, (valor, agora, id_destino)).fetchone()
+            conexao.executemany(_REGISTRAR, [
+                (id_origem, *origem, CODIGO_TIPO["transferência enviada"], valor, destinatario),
+                (id_destino, *destino, CODIGO_TIPO["transferência recebida"], valor, usuario),
+            ])
+
+    def saldo_total(self) -> float:
+        """Soma dos saldos de todas as contas."""
+        return self._conexao().execute("SELECT total(saldo) FROM contas").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._conexao().execute("SELECT count(*) FROM contas").fetchone()[0]
+
+
+class LimitesSQLite(MotorLimites):
+    """Limites por janela deslizante guardados no banco do `ContasSQLite`.
+
+    Com vários workers, os contadores em memória do `MotorLimites` seriam um
+    por processo. Aqui cada balde é uma linha de `limites_uso`, e o
+    `reservar` abre a transação `BEGIN IMMEDIATE` que a operação de saldo
+    executada dentro do bloco `with` reaproveita: a conferência dos limites,
+    o registro nos baldes e a mudança de saldo são gravados juntos, ou
+    desfeitos juntos. A faixa de cada conta também fica no banco.
+    """
+
+    def __init__(self, contas: ContasSQLite, faixas: Dict[str, Dict[str, Dict[str, Limite]]] = FAIXAS,
+                 faixa_padrao: str = "padrao", relogio: Callable[[], float] = time.time):
+        super().__init__(faixas, faixa_padrao, relogio)
+        self._contas = contas
+
+    def definir_faixa(self, conta: str, faixa: str) -> None:
+        if faixa not in self.faixas:
+            raise ValueError(f"Faixa {faixa} não configurada")
+        conta_id = self._contas._localizar(conta)
+        with self._contas._transacao() as conexao:
+            conexao.execute("INSERT OR REPLACE INTO limites_faixa (conta_id, faixa) VALUES (?, ?)", (conta_id, faixa))
+
+    def faixa(self, conta: str) -> str:
+        conta_id = self._contas.id_por_usuario(conta)
+        linha = self._contas._conexao().execute(
+            "SELECT faixa FROM limites_faixa WHERE conta_id = ?", (conta_id,)).fetchone()
+        return linha[0] if linha else self.faixa_padrao
+
+    @contextmanager
+    def reservar(self, conta: str, operacao: str, valor: float) -> Iterator[None]:
+        """Confere e registra a operação na mesma transação da mudança de saldo.
+
+        Lança `LimiteExcedido` se alguma janela seria ultrapassada. Se o
+        bloco `with` terminar com exceção, a transação inteira é desfeita,
+        junto com o registro nos baldes.
+        """
+        validar_valor(valor)
+        conta_id = self._contas._localizar(conta)
+        with self._contas._transacao() as conexao:
+            agora = self._relogio()
+            linha = conexao.execute("SELECT faixa FROM limites_faixa WHERE conta_id = ?", (conta_id,)).fetchone()
+            limites = self.faixas[linha[0] if linha else self.faixa_padrao].get(operacao, {})
+            for janela, limite in limites.items():
+                balde = balde_atual(janela, agora)
+                inicio = balde - JANELAS[janela][1]
+                # Os baldes que saíram da janela não contam mais
+                conexao.execute("DELETE FROM limites_uso WHERE conta_id = ? AND operacao = ? AND janela = ? AND balde <= ?",
+                                (conta_id, operacao, janela, inicio))
+                total_valor, total_quantidade = conexao.execute(_USO_JANELA, (conta_id, operacao, janela, inicio)).fetchone()
+                if total_quantidade + 1 > limite.quantidade:
+                    raise LimiteExcedido(operacao, janela, "quantidade")
+                if total_valor + valor > limite.valor:
+                    raise LimiteExcedido(operacao, janela, "valor")
+                conexao.execute(
+                    "INSERT INTO limites_uso (conta_id, operacao, janela, balde, valor, quantidade) VALUES (?, ?, ?, ?, ?, 1) "
+                    "ON CONFLICT DO UPDATE SET valor = valor + excluded.valor, quantidade = quantidade + 1",
+                    (conta_id, operacao, janela, balde, valor))
+            yield
+
+    def uso(self, conta: str) -> Dict[str, Dict[str, dict]]:
+        """Uso atual e limites da conta, por operação e janela."""
+        resultado: Dict[str, Dict[str, dict]] = {}
+        conta_id = self._contas.id_por_usuario(conta)
+        agora = self._relogio()
+        with self._contas._transacao("DEFERRED") as conexao:
+            for operacao, limites in self.faixas[self.faixa(conta)].items():
+                for janela, limite in limites.items():
+                    inicio = balde_atual(janela, agora) - JANELAS[janela][1]
+                    valor, quantidade = conexao.execute(_USO_JANELA, (conta_id, operacao, janela, inicio)).fetchone()
+                    resultado.setdefault(operacao, {})[janela] = {
+                        "valor": valor,
+                        "quantidade": int(quantidade),
+                        "limite_valor": limite.valor,
+                        "limite_quantidade": limite.quantidade,
+                    }
+        return resultado
+
+    def __len__(self) -> int:
+        """Quantidade de contas com baldes gravados."""
+        return self._contas._conexao().execute("SELECT count(DISTINCT conta_id) FROM limites_uso").fetchone()[0]
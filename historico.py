@@ -0,0 +1,99 @@
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import List, Optional
+
+# Tipos de transação guardados como código de 1 byte
+TIPOS = ("depósito", "retirada", "transferência enviada", "transferência recebida")
+CODIGO_TIPO = {tipo: codigo for codigo, tipo in enumerate(TIPOS)}
+
+# Campo da contraparte exibido no extrato para cada tipo de transferência
+CAMPO_CONTRAPARTE = {
+    CODIGO_TIPO["transferência enviada"]: "para",
+    CODIGO_TIPO["transferência recebida"]: "de",
+}
+
+MICROSSEGUNDOS = 1_000_000
+
+
+def para_epoch_us(data: datetime) -> int:
+    """Converte um datetime (com ou sem fuso) para microssegundos desde a época."""
+    return round(data.timestamp() * MICROSSEGUNDOS)
+
+
+def de_epoch_us(valor: int) -> datetime:
+    segundos, micro = divmod(valor, MICROSSEGUNDOS)
+    return datetime.fromtimestamp(segundos).replace(microsecond=micro)
+
+
+def montar_transacao(id_: int, data_us: int, codigo: int, valor: float, contraparte: Optional[str]) -> dict:
+    """Monta a entrada do extrato no formato retornado pela API."""
+    transacao = {
+        "id": id_,
+        "data": de_epoch_us(data_us).isoformat(),
+        "tipo": TIPOS[codigo],
+        "valor": valor
+    }
+    campo = CAMPO_CONTRAPARTE.get(codigo)
+    if campo is not None:
+        transacao[campo] = contraparte
+    return transacao
+
+
+class HistoricoConta:
+    """Histórico de transações de uma conta guardado em colunas.
+
+    Em vez de um dict por transação, cada campo fica em um `array` próprio:
+    data em microssegundos desde a época (int64), código do tipo (1 byte) e
+    valor (double). A contraparte das transferências é uma referência a uma
+    string internada. As datas são sempre crescentes, então os filtros por
+    período são resolvidos por busca binária.
+    """
+
+    __slots__ = ("_datas", "_tipos", "_valores", "_contrapartes")
+
+    def __init__(self):
+        self._datas = array("q")
+        self._tipos = array("B")
+        self._valores = array("d")
+        self._contrapartes: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return len(self._datas)
+
+    def registrar(self, tipo: str, valor: float, contraparte: Optional[str] = None, data_us: Optional[int] = None) -> int:
+        """Adiciona uma transação e retorna o seu id (posição no histórico, a partir de 1)."""
+        if data_us is None:
+            data_us = time.time_ns() // 1000
+        # Mantém a ordem mesmo se o relógio do sistema voltar no tempo
+        if self._datas and data_us < self._datas[-1]:
+            data_us = self._datas[-1]
+
+        self._datas.append(data_us)
+        self._tipos.append(CODIGO_TIPO[tipo])
+        self._valores.append(valor)
+        self._contrapartes.append(sys.intern(contraparte) if contraparte is not None else None)
+        return len(self._datas)
+
+    def intervalo(self, desde: Optional[datetime] = None, ate: Optional[datetime] = None):
+        """Retorna as posições [inicio, fim) das transações entre `desde` e `ate` (inclusive)."""
+        inicio = 0 if desde is None else bisect_left(self._datas, para_epoch_us(desde))
+        fim = len(self._datas) if ate is None else bisect_right(self._datas, para_epoch_us(ate))
+        return inicio, max(inicio, fim)
+
+    def listar(self, desde: Optional[datetime] = None, ate: Optional[datetime] = None, limite: Optional[int] = None) -> List[dict]:
+        """Monta o extrato do período em ordem cronológica.
+
+        Com `limite`, retorna apenas as `limite` transações mais recentes do
+        período. Só as transações retornadas são convertidas em dict.
+        """
+        inicio, fim = self.intervalo(desde, ate)
+        if limite is not None:
+            inicio = max(inicio, fim - limite)
+
+        return [
+            montar_transacao(i + 1, self._datas[i], self._tipos[i], self._valores[i], self._contrapartes[i])
+            for i in range(inicio, fim)
+        ]
@@ -0,0 +1,228 @@
+import math
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class Limite(NamedTuple):
+    """Máximo de valor somado e de quantidade de operações dentro de uma janela."""
+    valor: float
+    quantidade: int
+
+
+# Janelas deslizantes: duração em segundos e quantidade de baldes do anel.
+# A janela "hora" anda de minuto em minuto e a "dia" de 15 em 15 minutos.
+JANELAS = {
+    "hora": (3600, 60),
+    "dia": (86400, 96),
+}
+
+# Limites por faixa de conta, operação e janela
+FAIXAS: Dict[str, Dict[str, Dict[str, Limite]]] = {
+    "padrao": {
+        "retirada": {"hora": Limite(2000.0, 10), "dia": Limite(5000.0, 20)},
+        "transferencia": {"hora": Limite(5000.0, 20), "dia": Limite(10000.0, 50)},
+        "deposito": {"dia": Limite(50000.0, 50)},
+    },
+    "premium": {
+        "retirada": {"hora": Limite(10000.0, 30), "dia": Limite(25000.0, 100)},
+        "transferencia": {"hora": Limite(25000.0, 100), "dia": Limite(100000.0, 300)},
+        "deposito": {"dia": Limite(500000.0, 300)},
+    },
+}
+
+
+class LimiteExcedido(Exception):
+    """A operação ultrapassaria um limite da faixa da conta."""
+
+    def __init__(self, operacao: str, janela: str, criterio: str):
+        super().__init__(f"Limite de {criterio} por {janela} excedido para {operacao}")
+        self.operacao = operacao
+        self.janela = janela
+        self.criterio = criterio
+
+
+def validar_valor(valor: float) -> None:
+    """Só valores finitos e maiores que zero entram nos contadores."""
+    if not (math.isfinite(valor) and valor > 0):
+        raise ValueError(f"Valor inválido: {valor}")
+
+
+def balde_atual(janela: str, agora: float) -> int:
+    """Número do balde da janela que contém o instante `agora`."""
+    duracao, baldes = JANELAS[janela]
+    return int(agora // (duracao / baldes))
+
+
+class ContadorJanela:
+    """Soma de valores e quantidade de operações em uma janela deslizante.
+
+    A janela é dividida em baldes guardados em um anel (`array`). Ao passar
+    para um novo balde, os baldes que saíram da janela são zerados, então
+    consultar e registrar custam no máximo o número de baldes, não importa
+    quantas operações a conta já fez.
+    """
+
+    __slots__ = ("largura", "_valores", "_quantidades", "_ultimo", "valor", "quantidade")
+
+    def __init__(self, duracao: float, baldes: int):
+        self.largura = duracao / baldes
+        self._valores = array("d", [0.0]) * baldes
+        self._quantidades = array("L", [0]) * baldes
+        self._ultimo: Optional[int] = None
+        self.valor = 0.0
+        self.quantidade = 0
+
+    def _avancar(self, agora: float) -> int:
+        """Descarta os baldes que saíram da janela e retorna o balde atual."""
+        balde = int(agora // self.largura)
+        if self._ultimo is None or balde - self._ultimo >= len(self._valores):
+            for i in range(len(self._valores)):
+                self._valores[i] = 0.0
+                self._quantidades[i] = 0
+        elif balde > self._ultimo:
+            for b in range(self._ultimo + 1, balde + 1):
+                i = b % len(self._valores)
+                self._valores[i] = 0.0
+                self._quantidades[i] = 0
+        else:
+            # Relógio parado ou voltando no tempo: continua no último balde
+            return self._ultimo
+        self._ultimo = balde
+        # Recalcula a partir dos baldes para não acumular erro de arredondamento
+        self.valor = sum(self._valores)
+        self.quantidade = sum(self._quantidades)
+        return balde
+
+    def totais(self, agora: float) -> Tuple[float, int]:
+        self._avancar(agora)
+        return self.valor, self.quantidade
+
+    def adicionar(self, agora: float, valor: float) -> int:
+        """Registra uma operação e retorna o balde usado (para um eventual estorno)."""
+        balde = self._avancar(agora)
+        i = balde % len(self._valores)
+        self._valores[i] += valor
+        self._quantidades[i] += 1
+        self.valor += valor
+        self.quantidade += 1
+        return balde
+
+    def remover(self, balde: int, valor: float) -> None:
+        """Desfaz um `adicionar`, se o balde ainda estiver na janela."""
+        if self._ultimo is None or balde <= self._ultimo - len(self._valores):
+            return
+        i = balde % len(self._valores)
+        self._valores[i] -= valor
+        self._quantidades[i] -= 1
+        self.valor -= valor
+        self.quantidade -= 1
+
+
+class MotorLimites:
+    """Aplica os limites por janela deslizante de cada conta.
+
+    Os contadores de uma conta só existem enquanto ela tem operações dentro
+    da maior janela: as contas ficam em um OrderedDict na ordem do último
+    uso, e as que estão paradas há mais tempo que a maior janela são
+    descartadas do início da fila. Assim a memória acompanha o número de
+    contas ativas, e não o total de contas ou de transações.
+    """
+
+    def __init__(self, faixas: Dict[str, Dict[str, Dict[str, Limite]]] = FAIXAS, faixa_padrao: str = "padrao",
+                 relogio: Callable[[], float] = time.time):
+        if faixa_padrao not in faixas:
+            raise ValueError(f"Faixa {faixa_padrao} não configurada")
+        self.faixas = faixas
+        self.faixa_padrao = faixa_padrao
+        self._relogio = relogio
+        self._faixa_por_conta: Dict[str, str] = {}
+        # conta -> (instante do último uso, {(operação, janela): ContadorJanela})
+        self._contadores: "OrderedDict[str, Tuple[float, Dict[Tuple[str, str], ContadorJanela]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._maior_janela = max(duracao for duracao, _ in JANELAS.values())
+
+    def definir_faixa(self, conta: str, faixa: str) -> None:
+        if faixa not in self.faixas:
+            raise ValueError(f"Faixa {faixa} não configurada")
+        self._faixa_por_conta[conta] = faixa
+
+    def faixa(self, conta: str) -> str:
+        return self._faixa_por_conta.get(conta, self.faixa_padrao)
+
+    def limites(self, conta: str, operacao: str) -> Dict[str, Limite]:
+        """Limites da operação na faixa da conta, por janela."""
+        return self.faixas[self.faixa(conta)].get(operacao, {})
+
+    def _contadores_da_conta(self, conta: str, agora: float) -> Dict[Tuple[str, str], ContadorJanela]:
+        _, contadores = self._contadores.pop(conta, (agora, {}))
+        self._contadores[conta] = (agora, contadores)
+        # Descarta as contas sem operações dentro da maior janela
+        while self._contadores:
+            ultimo_uso, _ = next(iter(self._contadores.values()))
+            if agora - ultimo_uso <= self._maior_janela:
+                break
+            self._contadores.popitem(last=False)
+        return contadores
+
+    @contextmanager
+    def reservar(self, conta: str, operacao: str, valor: float) -> Iterator[None]:
+        """Confere e registra a operação nos contadores da conta.
+
+        Lança `LimiteExcedido` se alguma janela da faixa da conta seria
+        ultrapassada. Se o bloco `with` terminar com exceção (por exemplo,
+        saldo insuficiente), o registro é desfeito. Valores que não sejam
+        finitos e maiores que zero lançam `ValueError` antes de tocar nos
+        contadores.
+        """
+        validar_valor(valor)
+        limites = self.limites(conta, operacao)
+        registrados: List[Tuple[ContadorJanela, int]] = []
+        with self._lock:
+            agora = self._relogio()
+            contadores = self._contadores_da_conta(conta, agora)
+            selecionados = []
+            for janela, limite in limites.items():
+                contador = contadores.get((operacao, janela))
+                if contador is None:
+                    contador = contadores[(operacao, janela)] = ContadorJanela(*JANELAS[janela])
+                total_valor, total_quantidade = contador.totais(agora)
+                if total_quantidade + 1 > limite.quantidade:
+                    raise LimiteExcedido(operacao, janela, "quantidade")
+                if total_valor + valor > limite.valor:
+                    raise LimiteExcedido(operacao, janela, "valor")
+                selecionados.append(contador)
+            for contador in selecionados:
+                registrados.append((contador, contador.adicionar(agora, valor)))
+        try:
+            yield
+        except BaseException:
+            with self._lock:
+                for contador, balde in registrados:
+                    contador.remover(balde, valor)
+            raise
+
+    def uso(self, conta: str) -> Dict[str, Dict[str, dict]]:
+        """Uso atual e limites da conta, por operação e janela."""
+        resultado: Dict[str, Dict[str, dict]] = {}
+        with self._lock:
+            agora = self._relogio()
+            _, contadores = self._contadores.get(conta, (agora, {}))
+            for operacao, limites in self.faixas[self.faixa(conta)].items():
+                for janela, limite in limites.items():
+                    contador = contadores.get((operacao, janela))
+                    valor, quantidade = contador.totais(agora) if contador else (0.0, 0)
+                    resultado.setdefault(operacao, {})[janela] = {
+                        "valor": valor,
+                        "quantidade": quantidade,
+                        "limite_valor": limite.valor,
+                        "limite_quantidade": limite.quantidade,
+                    }
+        return resultado
+
+    def __len__(self) -> int:
+        """Quantidade de contas com contadores ativos."""
+        return len(self._contadores)
@@ -1,9 +1,21 @@
-from fastapi import FastAPI, Depends, HTTPException, Security
+from fastapi import APIRouter, FastAPI, Depends, Header, HTTPException, Query, Request, Response, Security
+from fastapi.openapi.utils import get_openapi
+from fastapi.responses import JSONResponse
 from fastapi.security import APIKeyHeader
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from auth import criar_token_jwt, verificar_token_jwt
-
-app = FastAPI()
+from typing import Optional
+import os
+from auth import RevogacoesTokens, cache_tokens, criar_token_jwt, revogar_token_jwt, verificar_token_jwt
+from cache_respostas import CacheRespostas, etag_confere, gerar_etag
+from contas import BackendContas, ContaNaoEncontrada, SaldoInsuficiente, abrir_store
+from limites import LimiteExcedido, MotorLimites
+
+# 🔹 Os endpoints ficam no router; a app é montada pelo create_app (no fim do
+# arquivo). Importar este módulo não abre o banco de contas: isso acontece
+# no lifespan, quando o servidor sobe.
+router = APIRouter()
 
 # 🔹 Definição do cabeçalho de autenticação
 api_key_header = APIKeyHeader(name="Authorization", auto_error=True)
@@ -14,13 +26,61 @@ fake_users_db = {
     "usuario2": {"username": "usuario2", "password": "senha456"}
 }
 
-# 🔹 Simulação de banco de dados de contas bancárias
-contas_bancarias_db = {
-    1: {"usuario": "usuario1", "saldo": 1000.0, "transacoes": []},
-    2: {"usuario": "usuario2", "saldo": 500.0, "transacoes": []}
+# 🔹 Contas criadas quando o armazenamento ainda não as tem
+CONTAS_INICIAIS = {
+    1: {"usuario": "usuario1", "saldo": 1000.0},
+    2: {"usuario": "usuario2", "saldo": 500.0}
 }
 
-@app.post("/login")
+@dataclass
+class ServicosContas:
+    """Armazenamento de contas e o que depende dele, guardados em `app.state.servicos`.
+
+    `limites`: limites por hora e por dia de retirada, transferência e
+    depósito. Com o ContasSQLite, os contadores ficam no mesmo banco e são
+    gravados na mesma transação da mudança de saldo.
+    `respostas`: respostas de /saldo e /extrato já serializadas, por versão
+    da conta.
+    """
+    contas: BackendContas
+    limites: MotorLimites
+    respostas: CacheRespostas = field(default_factory=CacheRespostas)
+
+def abrir_servicos(url_contas: Optional[str] = None) -> ServicosContas:
+    """Abre o armazenamento de contas (em memória, ou o SQLite de `url_contas`) e o motor de limites."""
+    contas = abrir_store(url_contas, CONTAS_INICIAIS)
+    # Com o banco compartilhado, um logout vale para todos os workers
+    if isinstance(contas, RevogacoesTokens):
+        cache_tokens.compartilhar_revogacoes(contas)
+    return ServicosContas(contas=contas, limites=contas.abrir_limites())
+
+def obter_servicos(request: Request) -> ServicosContas:
+    return request.app.state.servicos
+
+def responder_com_versao(servicos: ServicosContas, usuario: str, variante: tuple, if_none_match: Optional[str],
+                         montar) -> Response:
+    """Responde com ETag pela versão da conta.
+
+    Se o cliente já tem a versão atual (If-None-Match), responde 304 sem
+    corpo; senão usa o corpo guardado para essa versão ou chama `montar`.
+    A versão é lida antes dos dados: se uma operação acontecer no meio, o
+    corpo pode ser mais novo que a versão, nunca mais velho.
+    """
+    versao = servicos.contas.versao(usuario)
+    cabecalhos = {
+        "ETag": gerar_etag(servicos.contas.epoca, versao, usuario, variante),
+        "Cache-Control": "private, no-cache"
+    }
+    if if_none_match and etag_confere(if_none_match, cabecalhos["ETag"]):
+        return Response(status_code=304, headers=cabecalhos)
+
+    corpo = servicos.respostas.buscar(usuario, variante, versao)
+    if corpo is None:
+        corpo = JSONResponse(montar()).body
+        servicos.respostas.guardar(usuario, variante, versao, corpo)
+    return Response(content=corpo, media_type="application/json", headers=cabecalhos)
+
+@router.post("/login")
 def login(username: str, password: str):
     """Autentica o usuário e retorna um token JWT."""
     user = fake_users_db.get(username)
@@ -32,127 +92,158 @@ def login(username: str, password: str):
 
     return {"access_token": access_token, "token_type": "bearer"}
 
-def autenticar_usuario(api_key: str = Security(api_key_header)):
-    """Valida o token JWT enviado no cabeçalho Authorization."""
+def extrair_token(api_key: str = Security(api_key_header)):
+    """Extrai o token JWT do cabeçalho Authorization."""
     if not api_key.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Token inválido ou ausente")
+    return api_key.split(" ")[1]
 
-    token = api_key.split(" ")[1]
+def autenticar_usuario(token: str = Depends(extrair_token)):
+    """Valida o token JWT enviado no cabeçalho Authorization."""
     return verificar_token_jwt(token)
 
-@app.get("/saldo")
-def saldo(usuario: str = Depends(autenticar_usuario)):
-    """Retorna o saldo do usuário autenticado"""
-    for conta in contas_bancarias_db.values():
-        if conta["usuario"] == usuario:
-            return {"usuario": usuario, "saldo": conta["saldo"]}
-    raise HTTPException(status_code=404, detail="Usuário não encontrado")
+@router.post("/logout")
+def logout(token: str = Depends(extrair_token)):
+    """Revoga o token atual antes do vencimento."""
+    revogar_token_jwt(token)
+    return {"mensagem": "Logout realizado com sucesso."}
 
-@app.post("/retirada")
-def retirada(valor: float, usuario: str = Depends(autenticar_usuario)):
+@router.get("/auth/cache")
+def estatisticas_cache_tokens(usuario: str = Depends(autenticar_usuario)):
+    """Retorna os contadores do cache de tokens verificados."""
+    return cache_tokens.estatisticas()
+
+@router.get("/saldo")
+def saldo(usuario: str = Depends(autenticar_usuario), if_none_match: Optional[str] = Header(None),
+          servicos: ServicosContas = Depends(obter_servicos)):
+    """Retorna o saldo do usuário autenticado"""
+    try:
+        return responder_com_versao(servicos, usuario, ("saldo",), if_none_match,
+                                    lambda: {"usuario": usuario, "saldo": servicos.contas.saldo(usuario)})
+    except ContaNaoEncontrada:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+
+@router.post("/retirada")
+def retirada(valor: float = Query(..., gt=0, allow_inf_nan=False), usuario: str = Depends(autenticar_usuario),
+             servicos: ServicosContas = Depends(obter_servicos)):
     """Realiza uma retirada do saldo do usuário autenticado"""
-    for conta in contas_bancarias_db.values():
-        if conta["usuario"] == usuario:
-            if conta["saldo"] >= valor:
-                conta["saldo"] -= valor
-                transacao = {
-                    "id": len(conta["transacoes"]) + 1,
-                    "data": datetime.now().isoformat(),
-                    "tipo": "retirada",
-                    "valor": valor
-                }
-                conta["transacoes"].append(transacao)
-                return {"mensagem": f"Retirada de {valor} realizada com sucesso."}
-            else:
-                raise HTTPException(status_code=400, detail="Saldo insuficiente")
-    raise HTTPException(status_code=404, detail="Usuário não encontrado")
-
-@app.get("/extrato")
-def extrato(usuario: str = Depends(autenticar_usuario)):
-    """Retorna o extrato bancário do usuário autenticado"""
-    for conta in contas_bancarias_db.values():
-        if conta["usuario"] == usuario:
-            return {
-                "usuario": usuario,
-                "extrato": conta["transacoes"],
-                "saldo_atual": conta["saldo"]
-            }
-    raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    try:
+        with servicos.limites.reservar(usuario, "retirada", valor):
+            servicos.contas.retirar(usuario, valor)
+    except LimiteExcedido as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ContaNaoEncontrada:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    except SaldoInsuficiente:
+        raise HTTPException(status_code=400, detail="Saldo insuficiente")
+    return {"mensagem": f"Retirada de {valor} realizada com sucesso."}
+
+@router.get("/extrato")
+def extrato(desde: Optional[datetime] = None,
+            ate: Optional[datetime] = None,
+            limite: Optional[int] = Query(None, ge=1),
+            usuario: str = Depends(autenticar_usuario),
+            if_none_match: Optional[str] = Header(None),
+            servicos: ServicosContas = Depends(obter_servicos)):
+    """Retorna o extrato bancário do usuário autenticado.
+
+    `desde` e `ate` filtram o período; `limite` retorna só as transações
+    mais recentes desse período.
+    """
+    def montar():
+        transacoes, saldo_atual = servicos.contas.extrato(usuario, desde, ate, limite)
+        return {
+            "usuario": usuario,
+            "extrato": transacoes,
+            "saldo_atual": saldo_atual
+        }
+
+    try:
+        return responder_com_versao(servicos, usuario, ("extrato", desde, ate, limite), if_none_match, montar)
+    except ContaNaoEncontrada:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
 # 🔹 Endpoint para transferência entre usuários
-@app.post("/transferencia")
-def transferencia(destinatario: str, valor: float, usuario: str = Depends(autenticar_usuario)):
+@router.post("/transferencia")
+def transferencia(destinatario: str, valor: float = Query(..., gt=0, allow_inf_nan=False),
+                  usuario: str = Depends(autenticar_usuario), servicos: ServicosContas = Depends(obter_servicos)):
     """Realiza uma transferência para outro usuário"""
-    if destinatario not in [conta["usuario"] for conta in contas_bancarias_db.values()]:
-        raise HTTPException(status_code=404, detail="Destinatário não encontrado")
-
-    conta_origem = next((conta for conta in contas_bancarias_db.values() if conta["usuario"] == usuario), None)
-    conta_destino = next((conta for conta in contas_bancarias_db.values() if conta["usuario"] == destinatario), None)
-
-    if not conta_origem or not conta_destino:
+    try:
+        with servicos.limites.reservar(usuario, "transferencia", valor):
+            servicos.contas.transferir(usuario, destinatario, valor)
+    except LimiteExcedido as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ContaNaoEncontrada as e:
+        if e.usuario == destinatario:
+            raise HTTPException(status_code=404, detail="Destinatário não encontrado")
         raise HTTPException(status_code=404, detail="Conta não encontrada")
-
-    if conta_origem["saldo"] < valor:
+    except SaldoInsuficiente:
         raise HTTPException(status_code=400, detail="Saldo insuficiente")
 
-    # Realiza a transferência
-    conta_origem["saldo"] -= valor
-    conta_destino["saldo"] += valor
-
-    # Registra a transação
-    transacao_origem = {
-        "id": len(conta_origem["transacoes"]) + 1,
-        "data": datetime.now().isoformat(),
-        "tipo": "transferência enviada",
-        "valor": valor,
-        "para": destinatario
-    }
-    conta_origem["transacoes"].append(transacao_origem)
-
-    transacao_destino = {
-        "id": len(conta_destino["transacoes"]) + 1,
-        "data": datetime.now().isoformat(),
-        "tipo": "transferência recebida",
-        "valor": valor,
-        "de": usuario
-    }
-    conta_destino["transacoes"].append(transacao_destino)
-
     return {"mensagem": f"Transferência de {valor} para {destinatario} realizada com sucesso."}
 
 # 🔹 Endpoint para depositar dinheiro
-@app.post("/deposito")
-def deposito(valor: float, usuario: str = Depends(autenticar_usuario)):
+@router.post("/deposito")
+def deposito(valor: float = Query(..., gt=0, allow_inf_nan=False), usuario: str = Depends(autenticar_usuario),
+             servicos: ServicosContas = Depends(obter_servicos)):
     """Realiza um depósito na conta do usuário autenticado"""
-    for conta in contas_bancarias_db.values():
-        if conta["usuario"] == usuario:
-            conta["saldo"] += valor
-            transacao = {
-                "id": len(conta["transacoes"]) + 1,
-                "data": datetime.now().isoformat(),
-                "tipo": "depósito",
-                "valor": valor
-            }
-            conta["transacoes"].append(transacao)
-            return {"mensagem": f"Depósito de {valor} realizado com sucesso."}
-    raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    try:
+        with servicos.limites.reservar(usuario, "deposito", valor):
+            servicos.contas.depositar(usuario, valor)
+    except LimiteExcedido as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ContaNaoEncontrada:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    return {"mensagem": f"Depósito de {valor} realizado com sucesso."}
+
+@router.get("/limites")
+def limites(usuario: str = Depends(autenticar_usuario), servicos: ServicosContas = Depends(obter_servicos)):
+    """Retorna o uso e os limites por hora e por dia do usuário autenticado."""
+    return {"usuario": usuario, "faixa": servicos.limites.faixa(usuario), "limites": servicos.limites.uso(usuario)}
 
 # 🔹 Adiciona a autenticação no Swagger UI
-@app.on_event("startup")
-def customize_openapi():
-    if not app.openapi_schema:
-        return
-    openapi_schema = app.openapi()
-    openapi_schema["components"] = {
-        "securitySchemes": {
-            "APIKeyAuth": {
-                "type": "apiKey",
-                "in": "header",
-                "name": "Authorization"
-            }
+def gerar_openapi(app: FastAPI):
+    """Gera o documento OpenAPI na primeira chamada (já com o esquema de segurança) e o reaproveita nas seguintes."""
+    if app.openapi_schema:
+        return app.openapi_schema
+    openapi_schema = get_openapi(title=app.title, version=app.version, routes=app.routes)
+    openapi_schema.setdefault("components", {})["securitySchemes"] = {
+        "APIKeyAuth": {
+            "type": "apiKey",
+            "in": "header",
+            "name": "Authorization"
         }
     }
     for path in openapi_schema["paths"].values():
         for method in path.values():
             method["security"] = [{"APIKeyAuth": []}]
     app.openapi_schema = openapi_schema
+    return app.openapi_schema
+
+# 🔹 Fábrica da aplicação
+def create_app(url_contas: Optional[str] = None) -> FastAPI:
+    """Monta a app sem abrir o banco de contas.
+
+    O armazenamento (`url_contas` ou, sem ela, a variável CONTAS_DB) é aberto
+    no lifespan. Se `app.state.servicos` já tiver sido preenchido antes de
+    subir (por exemplo, pelo bench_carga), ele é mantido.
+    """
+    @asynccontextmanager
+    async def ciclo_de_vida(app: FastAPI):
+        if app.state.servicos is None:
+            app.state.servicos = abrir_servicos(url_contas or os.getenv("CONTAS_DB"))
+        yield
+
+    app = FastAPI(lifespan=ciclo_de_vida)
+    app.state.servicos = None
+    app.include_router(router)
+    app.openapi = lambda: gerar_openapi(app)
+    return app
+
+app = create_app()
@@ -0,0 +1,134 @@
+"""Mede o tempo de importação e de inicialização das duas APIs.
+
+Para cada app, roda vários processos Python novos e mede em cada um:
+- importacao_ms: `import main` (inclui FastAPI, SQLAlchemy etc.);
+- inicializacao_ms: o lifespan da app até ficar pronta para atender;
+- openapi_ms / openapi_cache_ms: primeira geração do /openapi.json e a
+  chamada seguinte, que deve vir da memória.
+
+Mostra a mediana de cada medida e sai com código 1 se importação mais
+inicialização passar do orçamento.
+
+Uso:
+    python medir_inicializacao.py
+    python medir_inicializacao.py --app transacoes --repeticoes 10 --orcamento-ms 800
+    python medir_inicializacao.py --sem-migrar
+
+A API de transações usa um banco SQLite temporário, então o `transacoes.db`
+não é alterado. Com --sem-migrar, o banco é migrado antes (fora da medição)
+e a app sobe com MIGRAR_NO_INICIO=0.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+PASTA_APPS = {
+    "raiz": RAIZ,
+    "transacoes": os.path.join(RAIZ, "api-transacoes"),
+}
+MEDIDAS = ("importacao_ms", "inicializacao_ms", "openapi_ms", "openapi_cache_ms")
+
+
+async def executar_lifespan(app) -> float:
+    """Sobe a app pelo protocolo de lifespan do ASGI, desce em seguida e retorna o tempo de subida."""
+    entrada: asyncio.Queue = asyncio.Queue()
+    pronta = asyncio.Event()
+
+    async def receber():
+        return await entrada.get()
+
+    async def enviar(mensagem):
+        if mensagem["type"].startswith("lifespan.startup"):
+            if mensagem["type"] == "lifespan.startup.failed":
+                raise RuntimeError(mensagem.get("message"))
+            pronta.set()
+
+    inicio = time.perf_counter()
+    tarefa = asyncio.create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, receber, enviar))
+    await entrada.put({"type": "lifespan.startup"})
+    await pronta.wait()
+    duracao = time.perf_counter() - inicio
+    await entrada.put({"type": "lifespan.shutdown"})
+    await tarefa
+    return duracao
+
+
+def medir_processo(app_nome: str) -> dict:
+    """Uma medição completa (chamada dentro do subprocesso)."""
+    pasta = PASTA_APPS[app_nome]
+    sys.path.insert(0, pasta)
+    os.chdir(pasta)
+
+    inicio = time.perf_counter()
+    import main
+    importacao = time.perf_counter() - inicio
+
+    inicializacao = asyncio.run(executar_lifespan(main.app))
+
+    inicio = time.perf_counter()
+    main.app.openapi()
+    openapi = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    main.app.openapi()
+    openapi_cache = time.perf_counter() - inicio
+
+    return dict(zip(MEDIDAS, (round(valor * 1000, 3) for valor in (importacao, inicializacao, openapi, openapi_cache))))
+
+
+def preparar_ambiente(app_nome: str, sem_migrar: bool) -> dict:
+    """Variáveis de ambiente do subprocesso; a API de transações usa um banco novo a cada medição."""
+    ambiente = dict(os.environ)
+    if app_nome == "transacoes":
+        pasta = tempfile.mkdtemp(prefix="medir_inicializacao_")
+        ambiente["DATABASE_URL"] = f"sqlite:///{os.path.join(pasta, 'inicio.db')}"
+        ambiente["LOG_ARQUIVO"] = os.path.join(pasta, "app.log")
+        if sem_migrar:
+            subprocess.run([sys.executable, "migrar.py"], cwd=PASTA_APPS[app_nome], env=ambiente,
+                           stdout=subprocess.DEVNULL, check=True)
+            ambiente["MIGRAR_NO_INICIO"] = "0"
+    return ambiente
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo de importação e de inicialização das APIs.")
+    parser.add_argument("--app", choices=["raiz", "transacoes", "todas"], default="todas")
+    parser.add_argument("--repeticoes", type=int, default=5, help="processos novos por app")
+    parser.add_argument("--orcamento-ms", type=float, default=1500.0,
+                        help="limite para a mediana de importação + inicialização de cada app")
+    parser.add_argument("--sem-migrar", action="store_true", help="sobe a API de transações sem aplicar migrações")
+    parser.add_argument("--subprocesso", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.subprocesso:
+        json.dump(medir_processo(args.subprocesso), sys.stdout)
+        return
+
+    apps = ["raiz", "transacoes"] if args.app == "todas" else [args.app]
+    sucesso = True
+    print(f"{'app':<11} " + " ".join(f"{medida:>17}" for medida in MEDIDAS) + f" {'total (ms)':>11} {'orçamento':>10}")
+    for app_nome in apps:
+        medicoes = []
+        for _ in range(args.repeticoes):
+            processo = subprocess.run([sys.executable, "-W", "ignore", os.path.abspath(__file__), "--subprocesso", app_nome],
+                                      env=preparar_ambiente(app_nome, args.sem_migrar), stdout=subprocess.PIPE, check=True)
+            medicoes.append(json.loads(processo.stdout))
+
+        medianas = {medida: statistics.median(m[medida] for m in medicoes) for medida in MEDIDAS}
+        total = medianas["importacao_ms"] + medianas["inicializacao_ms"]
+        dentro = total <= args.orcamento_ms
+        sucesso = sucesso and dentro
+        print(f"{app_nome:<11} " + " ".join(f"{medianas[medida]:>17.1f}" for medida in MEDIDAS)
+              + f" {total:>11.1f} {'ok' if dentro else 'ESTOUROU':>10}")
+
+    sys.exit(0 if sucesso else 1)
+
+
+if __name__ == "__main__":
+    main()
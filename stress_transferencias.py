@@ -0,0 +1,115 @@
+"""Teste de estresse das transferências concorrentes entre contas.
+
+Dispara transferências aleatórias entre contas com quantidades crescentes
+de threads e, para cada rodada, mostra a vazão e confere se a soma dos
+saldos continua igual à inicial (nenhum valor criado ou perdido).
+
+Por padrão usa o AccountStore em memória. Com --banco, usa o ContasSQLite
+no arquivo informado, e --processos divide o trabalho entre vários
+processos, como os workers do uvicorn.
+
+Uso:
+    python stress_transferencias.py --contas 1000 --operacoes 200000 --threads 1 2 4 8 16
+    python stress_transferencias.py --banco /tmp/stress.db --processos 4 --threads 1 2 --operacoes 20000
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+
+from contas import SaldoInsuficiente, abrir_store
+
+SALDO_INICIAL = 1000.0
+
+
+def criar_store(quantidade: int, banco: str = None):
+    url = None
+    if banco:
+        for sufixo in ("", "-wal", "-shm"):
+            if os.path.exists(banco + sufixo):
+                os.remove(banco + sufixo)
+        url = f"sqlite:///{banco}"
+    contas = {conta_id: {"usuario": f"usuario{conta_id}", "saldo": SALDO_INICIAL} for conta_id in range(1, quantidade + 1)}
+    return abrir_store(url, contas), url
+
+
+def iniciar_threads(store, usuarios, threads: int, por_thread: int, semente: int, barreira):
+    """Cria as threads de transferência; todas aguardam a `barreira` antes de começar."""
+
+    def trabalhador(semente_thread: int):
+        aleatorio = random.Random(semente_thread)
+        barreira.wait()
+        for _ in range(por_thread):
+            origem, destino = aleatorio.sample(usuarios, 2)
+            try:
+                store.transferir(origem, destino, aleatorio.randint(1, 50))
+            except SaldoInsuficiente:
+                pass
+
+    trabalhadores = [threading.Thread(target=trabalhador, args=(semente + i,)) for i in range(threads)]
+    for t in trabalhadores:
+        t.start()
+    return trabalhadores
+
+
+def processo(url: str, usuarios, threads: int, por_thread: int, semente: int, barreira) -> None:
+    store = abrir_store(url)
+    for t in iniciar_threads(store, usuarios, threads, por_thread, semente, barreira):
+        t.join()
+
+
+def rodada(store, url, usuarios, processos: int, threads: int, operacoes: int) -> float:
+    """Executa `operacoes` transferências divididas entre processos e threads e retorna o tempo gasto."""
+    por_thread = operacoes // (processos * threads)
+    if processos == 1:
+        barreira = threading.Barrier(threads + 1)
+        trabalhadores = iniciar_threads(store, usuarios, threads, por_thread, 0, barreira)
+    else:
+        contexto = multiprocessing.get_context("spawn")
+        barreira = contexto.Barrier(processos * threads + 1)
+        trabalhadores = [
+            contexto.Process(target=processo, args=(url, usuarios, threads, por_thread, p * threads, barreira))
+            for p in range(processos)
+        ]
+        for t in trabalhadores:
+            t.start()
+    barreira.wait()
+    inicio = time.perf_counter()
+    for t in trabalhadores:
+        t.join()
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de estresse das transferências concorrentes.")
+    parser.add_argument("--contas", type=int, default=1000)
+    parser.add_argument("--operacoes", type=int, default=200000, help="transferências por rodada")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="threads por processo")
+    parser.add_argument("--banco", help="arquivo SQLite (recriado a cada rodada); sem ele, usa a memória")
+    parser.add_argument("--processos", type=int, default=1)
+    args = parser.parse_args()
+    if args.processos > 1 and not args.banco:
+        parser.error("--processos maior que 1 exige --banco (a memória não é compartilhada entre processos)")
+
+    sucesso = True
+    print(f"{'processos':>9} {'threads':>8} {'tempo (s)':>10} {'transf./s':>12} {'saldo conservado':>17}")
+    for threads in args.threads:
+        store, url = criar_store(args.contas, args.banco)
+        usuarios = [f"usuario{i}" for i in range(1, args.contas + 1)]
+        total_inicial = store.saldo_total()
+
+        tempo = rodada(store, url, usuarios, args.processos, threads, args.operacoes)
+
+        conservado = store.saldo_total() == total_inicial
+        sucesso = sucesso and conservado
+        feitas = args.operacoes // (args.processos * threads) * args.processos * threads
+        print(f"{args.processos:>9} {threads:>8} {tempo:>10.2f} {feitas / tempo:>12,.0f} {'sim' if conservado else 'NÃO':>17}")
+
+    sys.exit(0 if sucesso else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List
+
+
+class TravasPorConta:
+    """Conjunto fixo de locks distribuídos entre as contas ("lock striping").
+
+    Cada conta usa o lock da listra `conta_id % quantidade`, então a memória
+    não cresce com o número de contas e operações em contas de listras
+    diferentes rodam em paralelo. Quando uma operação envolve mais de uma
+    conta, os locks são sempre adquiridos em ordem crescente de listra, o
+    que impede deadlock entre transferências cruzadas (A→B e B→A).
+    """
+
+    def __init__(self, quantidade: int = 1024):
+        self._locks: List[threading.Lock] = [threading.Lock() for _ in range(quantidade)]
+
+    def _listras(self, *contas_ids: int) -> List[int]:
+        quantidade = len(self._locks)
+        return sorted({conta_id % quantidade for conta_id in contas_ids})
+
+    @contextmanager
+    def travar(self, *contas_ids: int) -> Iterator[None]:
+        """Bloqueia as contas informadas até o fim do bloco `with`."""
+        adquiridos = []
+        try:
+            for listra in self._listras(*contas_ids):
+                self._locks[listra].acquire()
+                adquiridos.append(listra)
+            yield
+        finally:
+            for listra in reversed(adquiridos):
+                self._locks[listra].release()